@@ -1,20 +1,40 @@
 import pygame
 import math
-from animation_loader import load_animation_frames  # Import the new animation loader function
+from asset_cache import load_animation_frames, release
+from audio import audio
+from game_clock import game_clock, interpolate
+
+ROTATION_STEPS = 128  # Projectile images are rotated to one of this many directions
+rotated_frames = {}  # (animation_path, step) -> animation frames rotated to that direction
+
+
+def get_rotation_step(direction):
+    return round(direction / math.tau * ROTATION_STEPS) % ROTATION_STEPS
+
+
+def get_rotated_frames(animation_path, frames, step):
+    # Rotated copies of animation frames, made only once for every direction
+    key = (animation_path, step)
+    if key not in rotated_frames:
+        angle = -step * 360 / ROTATION_STEPS
+        rotated_frames[key] = [pygame.transform.rotate(frame, angle) for frame in frames]
+    return rotated_frames[key]
+
+
+def release_rotated_frames():
+    # Drop the rotations made so far, flying projectiles keep their own frames
+    rotated_frames.clear()
 
 class Projectile(pygame.sprite.Sprite):
     def __init__(self, x, y, camera_x, camera_y, direction, speed, damage, animation_path, effect=None, max_distance=300, offset=20):
         super().__init__()
-        self.animation_frames = load_animation_frames(animation_path)  # Use the new function
+        self.animation_frames = load_animation_frames(animation_path)  # Frames shared through the asset cache
         self.current_frame = 0
         self.animation_speed = 3
         self.animation_counter = 0
         self.camera_x = camera_x
         self.camera_y = camera_y
 
-        self.hit_npc_sound = pygame.mixer.Sound("Assets/Sounds/Npc/ough.mp3")
-        self.hit_npc_sound.set_volume(0.3)
-
         # Calculate offset from player
         self.offset = offset
         offset_x = math.cos(direction) * self.offset
@@ -24,10 +44,11 @@ class Projectile(pygame.sprite.Sprite):
 
         # Projectile image intialization
         self.direction = direction
-        self.image = self.animation_frames[self.current_frame]
-        self.image = pygame.transform.rotate(self.image, -math.degrees(self.direction))
+        self.rotated_frames = get_rotated_frames(animation_path, self.animation_frames, get_rotation_step(direction))
+        self.image = self.rotated_frames[self.current_frame]
         self.rect = self.image.get_rect()
         self.rect.center = (start_x, start_y)
+        self.previous_position = self.rect.topleft  # Position before the last simulation step
 
         # Other parameters for projectile
         self.speed = speed
@@ -37,8 +58,9 @@ class Projectile(pygame.sprite.Sprite):
         self.start_pos = self.rect.center
         self.distance_traveled = 0
 
-    def update(self, npc_group, floating_text_group):
+    def update(self, npc_manager, floating_text_group):
         # Projectile movement
+        self.previous_position = self.rect.topleft
         self.rect.x += math.cos(self.direction) * self.speed
         self.rect.y += math.sin(self.direction) * self.speed
 
@@ -54,31 +76,34 @@ class Projectile(pygame.sprite.Sprite):
         self.animation_counter += 1
         if self.animation_counter >= self.animation_speed:
             self.animation_counter = 0
-            self.current_frame = (self.current_frame + 1) % len(self.animation_frames)
-            self.image = pygame.transform.rotate(
-                self.animation_frames[self.current_frame], -math.degrees(self.direction)
-            )
-
-        self.check_collision_with_npcs(npc_group, floating_text_group)
-
-    def check_collision_with_npcs(self, npc_group, floating_text_group):
-        for npc in npc_group:
-            if self.rect.colliderect(npc.rect):
-                self.hit_npc_sound.play()
-                # Deal damage to NPC
-                npc.take_damage(self.damage, floating_text_group)
-
-                # Apply effect of projectile to the NPC
-                if self.effect == "knockback":
-                    npc.knockback(self.direction, 150)
-                elif self.effect == "slow":
-                    npc.apply_effect("slow", 3000)
-                elif self.effect == "overheat":
-                    npc.apply_effect("overheat", 3000)
-
-                # Destroy projectile after collision
-                self.kill()
-                break
+            self.current_frame = (self.current_frame + 1) % len(self.rotated_frames)
+            self.image = self.rotated_frames[self.current_frame]
+
+        self.check_collision_with_npcs(npc_manager, floating_text_group)
+
+    def kill(self):
+        # Return shared frames to the asset cache
+        if self.alive():
+            release(self.animation_frames)
+        super().kill()
+
+    def check_collision_with_npcs(self, npc_manager, floating_text_group):
+        for npc in npc_manager.get_npcs_in_rect(self.rect):
+            audio.play("npc_hit")
+            # Deal damage to NPC
+            npc.take_damage(self.damage, floating_text_group)
+
+            # Apply effect of projectile to the NPC
+            if self.effect == "knockback":
+                npc.knockback(self.direction, 150)
+            elif self.effect == "slow":
+                npc.apply_effect("slow", 3000)
+            elif self.effect == "overheat":
+                npc.apply_effect("overheat", 3000)
+
+            # Destroy projectile after collision
+            self.kill()
+            break
 
 
 class EarthSpike(pygame.sprite.Sprite):
@@ -86,25 +111,25 @@ class EarthSpike(pygame.sprite.Sprite):
         super().__init__()
         self.radius = radius
         self.damage = damage
-        self.spawn_time = pygame.time.get_ticks()
+        self.spawn_time = game_clock.get_ticks()
         self.lifetime = lifetime
-        self.npc_group = []
+        self.npc_manager = None
         self.floating_text_group = []
         self.damage_applied = False
 
         # Animation load
-        self.animation_frames = load_animation_frames(animation_path, 80, 80)  # Use the new function
+        self.animation_frames = load_animation_frames(animation_path, 80, 80)  # Frames shared through the asset cache
         self.current_frame = 0
         self.animation_speed = lifetime // len(self.animation_frames)  # Trvanie každého snímku
-        self.animation_timer = pygame.time.get_ticks()
+        self.animation_timer = game_clock.get_ticks()
 
         # First frame init
         self.image = pygame.transform.scale(self.animation_frames[self.current_frame], (radius * 2, radius * 2))
         self.rect = self.image.get_rect(center=(x, y))
 
-    def update(self, npc_group, floating_text_group):
-        current_time = pygame.time.get_ticks()
-        self.npc_group = npc_group
+    def update(self, npc_manager, floating_text_group):
+        current_time = game_clock.get_ticks()
+        self.npc_manager = npc_manager
         self.floating_text_group = floating_text_group
 
         # Play animation only once
@@ -122,13 +147,19 @@ class EarthSpike(pygame.sprite.Sprite):
         if current_time - self.spawn_time > self.lifetime:
             self.kill()
 
+    def kill(self):
+        # Return shared frames to the asset cache
+        if self.alive():
+            release(self.animation_frames)
+        super().kill()
+
     def apply_damage(self):
-        # Apply damage to the NPC
-        for npc in self.npc_group:
-            distance = math.dist(self.rect.center, npc.rect.center)
-            if distance <= self.radius:
-                npc.take_damage(self.damage, self.floating_text_group)
-                self.damage_applied = True
+        # Apply damage to NPCs in the radius
+        if self.npc_manager is None:
+            return
+        for npc in self.npc_manager.get_npcs_in_radius(self.rect.center, self.radius):
+            npc.take_damage(self.damage, self.floating_text_group)
+            self.damage_applied = True
 
 class AbilitySystem:
     def __init__(self, floating_text_group):
@@ -151,40 +182,28 @@ class AbilitySystem:
             "Earthspikes": {"cooldown": 4000, "last_use": None},  # 7-sekundový cooldown
         }
 
-        # Load sound effects
-        self.fireball_sound = pygame.mixer.Sound("Assets/Sounds/Abilities/fireball.mp3")
-        self.iceblast_sound = pygame.mixer.Sound("Assets/Sounds/Abilities/iceblast.mp3")
-        self.wind_sound = pygame.mixer.Sound("Assets/Sounds/Abilities/wind.mp3")
-        self.earthspikes_sound = pygame.mixer.Sound("Assets/Sounds/Abilities/earthspikes.mp3")
-        self.choose_ability_click_sound = pygame.mixer.Sound("Assets/Sounds/UI/click.mp3")
-        self.fireball_sound.set_volume(0.2)
-        self.iceblast_sound.set_volume(0.2)
-        self.wind_sound.set_volume(0.1)
-        self.earthspikes_sound.set_volume(0.4)
-        self.choose_ability_click_sound.set_volume(0.6)
-
     def switch_ability_forward(self):
-        current_time = pygame.time.get_ticks()
+        current_time = game_clock.get_ticks()
         if current_time - self.last_switch_time >= self.switch_cooldown:
             current_index = self.abilities.index(self.selected_ability)
             self.selected_ability = self.abilities[(current_index + 1) % len(self.abilities)]
             self.last_switch_time = current_time
-            self.choose_ability_click_sound.play()
+            audio.play("ability_click")
 
     def switch_ability_backward(self):
-        current_time = pygame.time.get_ticks()
+        current_time = game_clock.get_ticks()
         if current_time - self.last_switch_time >= self.switch_cooldown:
             current_index = self.abilities.index(self.selected_ability)
             self.selected_ability = self.abilities[(current_index - 1) % len(self.abilities)]
             self.last_switch_time = current_time
-            self.choose_ability_click_sound.play()
+            audio.play("ability_click")
 
     def select_ability_by_index(self, index):
         if 0 <= index < len(self.abilities):
             self.selected_ability = self.abilities[index]
 
     def trigger_ability(self, x, y, camera_x, camera_y):
-        current_time = pygame.time.get_ticks()
+        current_time = game_clock.get_ticks()
 
         # Check cooldown
         ability_data = self.cooldowns[self.selected_ability]
@@ -199,17 +218,17 @@ class AbilitySystem:
             if self.selected_ability == "Fireball":
                 animation_path = "Assets/Abilities/Fire"
                 projectile = Projectile(x, y, camera_x, camera_y, angle, 3, 15, animation_path, "overheat", 150)
-                self.fireball_sound.play()
+                audio.play("fireball")
                 self.projectiles.add(projectile)
             elif self.selected_ability == "Iceblast":
                 animation_path = "Assets/Abilities/Water"
                 projectile = Projectile(x, y, camera_x, camera_y, angle, 3, 10, animation_path, "slow", 350)
-                self.iceblast_sound.play()
+                audio.play("iceblast")
                 self.projectiles.add(projectile)
             elif self.selected_ability == "Wind":
                 animation_path = "Assets/Abilities/Wind"
                 projectile = Projectile(x, y, camera_x, camera_y, angle, 8, 2, animation_path, "knockback", 500)
-                self.wind_sound.play()
+                audio.play("wind")
                 self.projectiles.add(projectile)
             elif self.selected_ability == "Earthspikes":
 
@@ -227,20 +246,24 @@ class AbilitySystem:
                 spike = EarthSpike(spike_x, spike_y, radius, damage, lifetime, animation_path)
                 self.spikes.add(spike)
                 spike.apply_damage()
-                self.earthspikes_sound.play()
+                audio.play("earthspikes")
 
             # Save last use time
             ability_data["last_use"] = current_time
             self.last_ability_time = current_time
 
 
-    def update_abilities(self, npc_group):
-        self.projectiles.update(npc_group, self.floating_text_group)
-        self.spikes.update(npc_group, self.floating_text_group)
+    def update_abilities(self, npc_manager):
+        self.projectiles.update(npc_manager, self.floating_text_group)
+        self.spikes.update(npc_manager, self.floating_text_group)
         self.floating_texts.update()
 
-    def draw_abilities(self, screen, camera_x, camera_y):
+    def draw_abilities(self, screen, camera_x, camera_y, alpha=1.0):
+        # Returns screen rects of drawn projectiles and spikes, projectiles are drawn between their last two positions
+        drawn_rects = []
         for projectile in self.projectiles:
-            screen.blit(projectile.image, projectile.rect.move(-camera_x, -camera_y))
+            x, y = interpolate(projectile.previous_position, projectile.rect.topleft, alpha)
+            drawn_rects.append(screen.blit(projectile.image, (x - camera_x, y - camera_y)))
         for spike in self.spikes:
-            screen.blit(spike.image, spike.rect.move(-camera_x, -camera_y))
\ No newline at end of file
+            drawn_rects.append(screen.blit(spike.image, spike.rect.move(-camera_x, -camera_y)))
+        return drawn_rects
\ No newline at end of file
@@ -1,7 +1,16 @@
 import os
 import pygame
+from texture_atlas import atlas
+from pixel_cache import load_scaled_image
 
 def load_animations(base_path, width, height):
+    # Frames baked into the texture atlas when available, separate image files otherwise
+    animations = atlas.get_animations(base_path, (width, height))
+    if animations is not None:
+        return animations
+    return read_animations(base_path, width, height)
+
+def read_animations(base_path, width, height):
     animations = {}
     for animation_type in os.listdir(base_path):
         animation_path = os.path.join(base_path, animation_type)
@@ -9,23 +18,34 @@ def load_animations(base_path, width, height):
             frames = []
             for filename in sorted(os.listdir(animation_path), key=lambda x: int(''.join(filter(str.isdigit, x)))):
                 frame_path = os.path.join(animation_path, filename)
-                frame = pygame.image.load(frame_path)
-                frame = pygame.transform.scale(frame, (width, height))
+                frame = load_scaled_image(frame_path, (width, height))
                 frames.append(frame)
             animations[animation_type] = frames
     return animations
 
+def flip_animations(animations):
+    # Mirrored copies of all animations, for characters facing left
+    return {animation_type: [pygame.transform.flip(frame, True, False) for frame in frames]
+            for animation_type, frames in animations.items()}
+
 def load_animation_frames(animation_path, width=None, height=None):
+    frames = atlas.get_animation_frames(animation_path, (width, height) if width and height else None)
+    if frames is not None:
+        return frames
+    return read_animation_frames(animation_path, width, height)
+
+def read_animation_frames(animation_path, width=None, height=None):
     frames = []
     # List all files in the directory and sort them (you can adjust sorting as needed)
     for filename in sorted(os.listdir(animation_path)):
         file_path = os.path.join(animation_path, filename)
         if os.path.isfile(file_path) and file_path.endswith('.png'):
-            image = pygame.image.load(file_path).convert_alpha()
             # Check if the size is provided, if not set the size of the first image
+            image = load_scaled_image(file_path, (width, height) if width and height else None)
             if not width or not height:
                 width, height = image.get_size()
             # Scale the image to the specified width and height
-            image = pygame.transform.scale(image, (width, height))
+            if image.get_size() != (width, height):
+                image = pygame.transform.scale(image, (width, height))
             frames.append(image)
     return frames
@@ -0,0 +1,94 @@
+import threading
+import pygame
+from pixel_cache import load_scaled_image
+from animation_loader import load_animations as read_animations, load_animation_frames as read_animation_frames, flip_animations
+
+
+class AssetCache:
+    def __init__(self):
+        self.assets = {}  # (kind, path, size, flags) -> shared asset
+        self.ref_counts = {}
+        self.keys = {}  # id of a shared asset -> its key, so assets can be released directly
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()  # Levels are preloaded in a worker thread
+
+    def acquire(self, key, loader):
+        # Shared asset for the key, loaded on the first request
+        # Loading runs outside of the lock, so other threads are not blocked by it
+        with self.lock:
+            if key in self.assets:
+                self.hits += 1
+                self.ref_counts[key] += 1
+                return self.assets[key]
+        asset = loader()
+        with self.lock:
+            if key in self.assets:
+                self.hits += 1  # Another thread loaded it meanwhile
+            else:
+                self.misses += 1
+                self.assets[key] = asset
+                self.keys[id(asset)] = key
+            self.ref_counts[key] = self.ref_counts.get(key, 0) + 1
+            return self.assets[key]
+
+    def release(self, asset):
+        # Drop one reference, the asset is freed when nobody uses it anymore
+        with self.lock:
+            key = self.keys.get(id(asset))
+            if key is None:
+                return
+            self.ref_counts[key] -= 1
+            if self.ref_counts[key] <= 0:
+                del self.ref_counts[key]
+                del self.keys[id(self.assets.pop(key))]
+
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses, "assets": len(self.assets), "references": sum(self.ref_counts.values())}
+
+
+assets = AssetCache()
+
+
+def load_image(path, size=None, alpha=False):
+    # Image scaled to size, converted for fast blitting with alpha if requested
+    def loader():
+        if alpha:
+            return load_scaled_image(path, size)  # Converted images come from the on-disk pixel cache
+        image = pygame.image.load(path)
+        if size:
+            image = pygame.transform.scale(image, size)
+        return image
+    return assets.acquire(("image", path, size, alpha), loader)
+
+
+def load_sound(path, volume=None):
+    # Sounds with a different volume are separate assets, volume is shared by all users of one
+    def loader():
+        sound = pygame.mixer.Sound(path)
+        if volume is not None:
+            sound.set_volume(volume)
+        return sound
+    return assets.acquire(("sound", path, None, volume), loader)
+
+
+def load_animations(base_path, width, height):
+    return assets.acquire(("animations", base_path, (width, height), None), lambda: read_animations(base_path, width, height))
+
+
+def load_flipped_animations(base_path, width, height):
+    # Left facing copies of load_animations, flipped once for all characters using them
+    def loader():
+        animations = load_animations(base_path, width, height)
+        flipped = flip_animations(animations)
+        release(animations)
+        return flipped
+    return assets.acquire(("flipped_animations", base_path, (width, height), None), loader)
+
+
+def load_animation_frames(animation_path, width=None, height=None):
+    return assets.acquire(("animation_frames", animation_path, (width, height), None), lambda: read_animation_frames(animation_path, width, height))
+
+
+def release(asset):
+    assets.release(asset)
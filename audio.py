@@ -0,0 +1,160 @@
+import pygame
+from asset_cache import load_sound
+
+MUSIC_CHANNELS = 2  # Two music channels, so one track fades out while the other fades in
+EFFECT_CHANNELS = 12  # Channel pool shared by all sound effects
+MUSIC_FADE_MS = 300
+
+# Music tracks: name -> (path, volume)
+MUSIC = {
+    "background": ("Assets/Sounds/Music/background_music.mp3", 0.1),
+    "fight": ("Assets/Sounds/Music/fight_music.mp3", 0.2),
+}
+
+# Sound effect categories: name -> (voice cap, priority), a sound of higher priority can take the channel of a lower one
+SOUND_CATEGORIES = {
+    "interactive": (2, 3),
+    "ui": (2, 3),
+    "player": (2, 2),
+    "ability": (4, 1),
+    "hit": (3, 1),
+    "footstep": (1, 0),
+}
+
+# Sound effects: name -> (path, volume, category)
+SOUNDS = {
+    "interaction_click": ("Assets/Sounds/Controll_panel/interaction_click.mp3", 0.4, "interactive"),
+    "portal_open": ("Assets/Sounds/Controll_panel/portal_open.mp3", 0.8, "interactive"),
+    "ability_click": ("Assets/Sounds/UI/click.mp3", 0.6, "ui"),
+    "teleport": ("Assets/Sounds/Player/teleport.mp3", 0.8, "player"),
+    "player_hurt": ("Assets/Sounds/Player/ough.mp3", 0.6, "player"),
+    "fireball": ("Assets/Sounds/Abilities/fireball.mp3", 0.2, "ability"),
+    "iceblast": ("Assets/Sounds/Abilities/iceblast.mp3", 0.2, "ability"),
+    "wind": ("Assets/Sounds/Abilities/wind.mp3", 0.1, "ability"),
+    "earthspikes": ("Assets/Sounds/Abilities/earthspikes.mp3", 0.4, "ability"),
+    "npc_hit": ("Assets/Sounds/Npc/ough.mp3", 0.3, "hit"),
+    "footstep": ("Assets/Sounds/Player/footstep.wav", 0.6, "footstep"),
+}
+
+
+def get_sound_bytes(sounds):
+    # Decoded samples in the format of the mixer
+    mixer = pygame.mixer.get_init()
+    if mixer is None:
+        return 0
+    frequency, sample_format, channels = mixer
+    return sum(int(sound.get_length() * frequency) * channels * (abs(sample_format) // 8) for sound in sounds)
+
+
+class AudioManager:
+    # Sounds are decoded once and kept for the whole game, music tracks are played from memory instead of streamed
+    def __init__(self, music=MUSIC, sounds=SOUNDS, categories=SOUND_CATEGORIES, effect_channels=EFFECT_CHANNELS):
+        self.music_tracks = music
+        self.sound_effects = sounds
+        self.categories = categories
+        self.effect_channel_count = effect_channels
+        self.decoded = {}  # Sound or music name -> decoded sound
+        self.music_channels = []
+        self.effect_channels = []
+        self.voices = {}  # Index of a busy effect channel -> (category, priority, play order)
+        self.play_order = 0
+        self.music_slot = 0  # Music channel playing the current track
+        self.current_music = None
+
+    def setup(self):
+        # Channels are taken from the mixer on first use, it must be initialized by then
+        if self.music_channels:
+            return
+        pygame.mixer.set_num_channels(MUSIC_CHANNELS + self.effect_channel_count)
+        pygame.mixer.set_reserved(MUSIC_CHANNELS)  # Sounds played directly never take a music channel
+        self.music_channels = [pygame.mixer.Channel(index) for index in range(MUSIC_CHANNELS)]
+        self.effect_channels = [pygame.mixer.Channel(MUSIC_CHANNELS + index) for index in range(self.effect_channel_count)]
+
+    def preload(self):
+        # Decode all music tracks and sounds now instead of on their first play
+        for name in self.music_tracks:
+            self.get_music(name)
+        for name in self.sound_effects:
+            self.get_sound(name)
+
+    def load(self, path, volume):
+        # A missing or broken file stays silent instead of stopping the game
+        try:
+            return load_sound(path, volume)
+        except (OSError, pygame.error):
+            return None
+
+    def get_music(self, name):
+        if name not in self.decoded:
+            path, volume = self.music_tracks[name]
+            self.decoded[name] = self.load(path, volume)
+        return self.decoded[name]
+
+    def get_sound(self, name):
+        if name not in self.decoded:
+            path, volume, _ = self.sound_effects[name]
+            self.decoded[name] = self.load(path, volume)
+        return self.decoded[name]
+
+    def play_music(self, name, fade_ms=MUSIC_FADE_MS):
+        # Switch to a track, the previous one fades out meanwhile; a track which is already playing continues
+        self.setup()
+        if name == self.current_music and self.music_channels[self.music_slot].get_busy():
+            return
+        sound = self.get_music(name)
+        previous = self.music_channels[self.music_slot]
+        if fade_ms:
+            previous.fadeout(fade_ms)
+        else:
+            previous.stop()
+        self.music_slot = (self.music_slot + 1) % MUSIC_CHANNELS
+        if sound is not None:
+            self.music_channels[self.music_slot].play(sound, loops=-1, fade_ms=fade_ms)
+        self.current_music = name
+
+    def stop_music(self):
+        for channel in self.music_channels:
+            channel.stop()
+        self.current_music = None
+
+    def play(self, name):
+        # Play a sound effect on a channel of the pool, returns None when it was dropped
+        self.setup()
+        sound = self.get_sound(name)
+        if sound is None:
+            return None
+        category = self.sound_effects[name][2]
+        priority = self.categories[category][1]
+        index = self.get_effect_channel(category)
+        if index is None:
+            return None
+        channel = self.effect_channels[index]
+        channel.play(sound)
+        self.voices[index] = (category, priority, self.play_order)
+        self.play_order += 1
+        return channel
+
+    def get_effect_channel(self, category):
+        voice_cap, priority = self.categories[category]
+        self.voices = {index: voice for index, voice in self.voices.items() if self.effect_channels[index].get_busy()}
+
+        # A category at its cap replaces its oldest voice
+        same_category = [index for index, voice in self.voices.items() if voice[0] == category]
+        if len(same_category) >= voice_cap:
+            return min(same_category, key=lambda index: self.voices[index][2])
+
+        for index in range(len(self.effect_channels)):
+            if index not in self.voices:
+                return index
+
+        # Pool is full, steal the oldest voice of the lowest priority which is not above the new sound
+        candidates = [index for index, voice in self.voices.items() if voice[1] <= priority]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda index: (self.voices[index][1], self.voices[index][2]))
+
+    def get_resident_memory(self):
+        return get_sound_bytes(sound for sound in self.decoded.values() if sound is not None)
+
+
+audio = AudioManager()
@@ -0,0 +1,54 @@
+# Build step packing animation frames into texture atlases: python bake_atlas.py
+# Sizes must match the ones used in game, frames loaded at any other size fall back to the image files
+import os
+import pygame
+from animation_loader import read_animations, read_animation_frames
+from texture_atlas import build_atlas, save_atlas, get_entry_key, list_sources, ATLAS_DIR
+
+# (kind, directory, scaled size), kind "animations" has one subdirectory per animation type
+BAKE_SOURCES = [
+    ("animations", "Assets/Player", (50, 50)),
+    ("animations", "Assets/Maps/LavaPlace/Npc/Demon", (50, 50)),
+    ("animations", "Assets/Maps/AirPlace/Npc/AirGolem", (85, 85)),
+    ("animations", "Assets/Maps/SnowPlace/Npc/IceGolem", (85, 85)),
+    ("animations", "Assets/Maps/DirtPlace/Npc/DirtGolem", (85, 85)),
+    ("frames", "Assets/Abilities/Fire", None),
+    ("frames", "Assets/Abilities/Water", None),
+    ("frames", "Assets/Abilities/Wind", None),
+    ("frames", "Assets/Abilities/Earth", (80, 80)),
+]
+
+
+def get_sources(path, filter_file=None):
+    # Image files in the order the loaders read them
+    return [os.path.join(path, filename).replace(os.sep, "/") for filename in sorted(os.listdir(path))
+            if os.path.isfile(os.path.join(path, filename)) and (filter_file is None or filter_file(filename))]
+
+
+def collect_frames(kind, path, size):
+    if kind == "animations":
+        frames = []
+        for animation_type, surfaces in read_animations(path, *size).items():
+            sources = get_sources(os.path.join(path, animation_type))
+            sources.sort(key=lambda source: int(''.join(filter(str.isdigit, os.path.basename(source)))))
+            frames += [(animation_type, source, surface) for source, surface in zip(sources, surfaces)]
+        return frames
+    surfaces = read_animation_frames(path, *(size or (None, None)))
+    sources = get_sources(path, lambda filename: filename.endswith('.png'))
+    return [("", source, surface) for source, surface in zip(sources, surfaces)]
+
+
+def bake(sources=BAKE_SOURCES, atlas_dir=ATLAS_DIR):
+    entries = {get_entry_key(path, size): {"kind": kind, "sources": list_sources(path, kind), "frames": collect_frames(kind, path, size)}
+               for kind, path, size in sources}
+    pages, index = build_atlas(entries)
+    save_atlas(pages, index, atlas_dir)
+    frame_count = sum(len(entry["frames"]) for entry in entries.values())
+    print(f"Packed {frame_count} frames into {len(pages)} atlas page(s) in {atlas_dir}")
+
+
+if __name__ == "__main__":
+    pygame.init()
+    pygame.display.set_mode((1, 1), pygame.HIDDEN)  # convert_alpha needs a display
+    bake()
+    pygame.quit()
@@ -0,0 +1,209 @@
+# Headless benchmark of the main loop: python benchmark.py [scenario ...] [--output results.json] [--compare old.json]
+# Every scenario from benchmark_scenarios.json runs main.py in its own process with the SDL dummy drivers,
+# scripted input and one simulation step per frame, so runs of different versions simulate the same game.
+import argparse
+import json
+import math
+import os
+import random
+import runpy
+import subprocess
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS_FILE = os.path.join(ROOT, "benchmark_scenarios.json")
+# Laps of the main loop in the order they run, each section is timed by exactly one lap
+SECTIONS = ("frame", "events", "level", "player", "ability_update", "interactions", "npc_update",
+            "tiles", "objects", "ability_draw", "npc_draw", "text", "hud", "present")
+PERCENTILES = (50, 95, 99)
+
+# Projectiles kept flying in a scenario: animation path, speed, damage, effect, max distance (as AbilitySystem fires them)
+PROJECTILES = [
+    ("Assets/Abilities/Fire", 3, 15, "overheat", 150),
+    ("Assets/Abilities/Water", 3, 10, "slow", 350),
+    ("Assets/Abilities/Wind", 8, 2, "knockback", 500),
+]
+
+
+def load_scenarios(path=SCENARIOS_FILE):
+    with open(path) as file:
+        return {scenario["name"]: scenario for scenario in json.load(file)}
+
+
+class KeyState:
+    def __init__(self, pressed):
+        self.pressed = pressed
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+class ScriptedInput:
+    # Keyboard and mouse of the player for the current frame, stands in for the pygame input functions
+    def __init__(self, scenario, get_frame):
+        self.get_frame = get_frame
+        self.walk_keys = [pygame.key.key_code(key) for key in scenario.get("walk", "")]
+        self.walk_frames = scenario.get("walk_frames", 90)
+        self.sprint = scenario.get("sprint", True)
+        self.fire_every = scenario.get("fire_every", 0)
+        self.ability_keys = [pygame.key.key_code(key) for key in scenario.get("abilities", "1234")]
+
+    def get_pressed(self):
+        frame = self.get_frame()
+        pressed = set()
+        if self.walk_keys:
+            pressed.add(self.walk_keys[frame // self.walk_frames % len(self.walk_keys)])
+        if self.sprint and frame % 200 < 100:
+            pressed.add(pygame.K_LSHIFT)
+        if self.ability_keys:
+            pressed.add(self.ability_keys[frame // 40 % len(self.ability_keys)])
+        return KeyState(pressed)
+
+    def get_mouse_pressed(self, *args, **kwargs):
+        return (bool(self.fire_every) and self.get_frame() % self.fire_every == 0, False, False)
+
+    def get_mouse_pos(self):
+        frame = self.get_frame()
+        return (400 + frame * 13 % 300, 300 + frame * 7 % 200)
+
+    def install(self):
+        pygame.key.get_pressed = self.get_pressed
+        pygame.mouse.get_pressed = self.get_mouse_pressed
+        pygame.mouse.get_pos = self.get_mouse_pos
+
+
+def get_game():
+    # Globals of main.py while it runs
+    return sys.modules["__main__"].__dict__
+
+
+def setup_scenario(scenario):
+    # Runs in place of the intro screen, right before the main loop starts
+    from npc import NPCManager
+    from npc_swarm import SwarmNPCManager
+    game = get_game()
+    game["npc_manager_type"] = SwarmNPCManager if scenario.get("swarm") else NPCManager
+    if scenario["map"] != game["current_level"].map_file:
+        game["load_new_map"](scenario["map"])
+    if type(game["npc_manager"]) is not game["npc_manager_type"]:
+        game["npc_manager"].release_assets()
+        game["npc_manager"] = game["npc_manager_type"](game["floating_text_group"], game["tmx_data"], *game["LEVEL_NPCS"][scenario["map"]])
+        game["current_level"].npc_manager = game["npc_manager"]
+
+    npcs = scenario.get("npcs", 0)
+    if npcs:
+        # Killed NPCs are replaced by the manager, one every simulation step
+        game["npc_manager"].max_enemies = npcs
+        for _ in range(npcs):
+            game["npc_manager"].spawn_npc(game["player"])
+        game["spawn_npcs"] = game["npc_spawned_once"] = True
+    spawn_projectiles(scenario.get("projectiles", 0), 0)
+
+
+def spawn_projectiles(count, frame):
+    # Keep the configured number of projectiles flying away from the player in all directions
+    from abilities import Projectile
+    game = get_game()
+    projectiles = game["ability_system"].projectiles
+    player, camera = game["player"], game["camera"]
+    for index in range(count - len(projectiles)):
+        path, speed, damage, effect, max_distance = PROJECTILES[(frame + index) % len(PROJECTILES)]
+        direction = (frame * 0.37 + index * 2.4) % math.tau
+        projectiles.add(Projectile(player.rect.centerx, player.rect.centery, *camera.get_offset(), direction, speed, damage, path, effect, max_distance))
+
+
+def get_statistics(frames):
+    # Milliseconds per section at the percentiles, sections not run in a frame count as 0
+    statistics = {}
+    for section in SECTIONS:
+        times = np.array([frame.get(section, 0.0) for frame in frames]) * 1000
+        statistics[section] = {f"p{percentile}": round(float(np.percentile(times, percentile)), 3) for percentile in PERCENTILES}
+        statistics[section]["mean"] = round(float(times.mean()), 3)
+    return statistics
+
+
+def run_scenario(scenario):
+    # Runs main.py with the scenario in this process, returns its frame statistics
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    random.seed(scenario.get("seed", 1))
+    np.random.seed(scenario.get("seed", 1))
+
+    import screens
+    from frame_profiler import frame_profiler
+    from game_clock import game_clock
+
+    warmup, frames = scenario.get("warmup", 60), scenario["frames"]
+    frame_profiler.enabled = True
+    frame_profiler.frame_limit = warmup + frames
+    game_clock.real_time = lambda: frame_profiler.frame_count / game_clock.tick_rate  # One simulation step per frame
+    ScriptedInput(scenario, lambda: frame_profiler.frame_count).install()
+    screens.intro_screen = lambda: setup_scenario(scenario)
+
+    frame_profiler.on_frame = lambda frame: spawn_projectiles(scenario.get("projectiles", 0), frame)
+
+    game = runpy.run_path(os.path.join(ROOT, "main.py"), run_name="__main__")
+    return {"frames": frames, "sections": get_statistics(frame_profiler.frames[warmup:]), "failed_spawns": game["npc_manager"].failed_spawns}
+
+
+def run_in_subprocess(name, scenarios_file):
+    # Every scenario gets a fresh process, main.py and the asset caches can not be reset in place
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", name, "--scenarios", scenarios_file],
+                            capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(f"Scenario {name} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def print_results(results, previous=None):
+    for name, result in results.items():
+        print(f"\n{name} ({result['frames']} frames, ms)")
+        print(f"{'section':<16}" + "".join(f"{key:>10}" for key in ("mean", *(f"p{p}" for p in PERCENTILES))) + ("   p95 change" if previous else ""))
+        for section, values in result["sections"].items():
+            line = f"{section:<16}" + "".join(f"{values[key]:>10.3f}" for key in ("mean", *(f"p{p}" for p in PERCENTILES)))
+            old = previous and previous.get(name, {}).get("sections", {}).get(section)
+            if old and old["p95"]:
+                line += f"{(values['p95'] - old['p95']) / old['p95'] * 100:>+12.1f}%"
+            print(line)
+        print(f"failed spawns: {result.get('failed_spawns', 0)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmark of the main loop")
+    parser.add_argument("scenarios", nargs="*", help="names of scenarios to run, all of them by default")
+    parser.add_argument("--scenarios", dest="scenarios_file", default=SCENARIOS_FILE, help="JSON file with the scenarios")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--run", help=argparse.SUPPRESS)  # Runs one scenario in this process and prints its results
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.scenarios_file)
+    if args.run:
+        print(json.dumps(run_scenario(scenarios[args.run])))
+        return
+
+    names = args.scenarios or list(scenarios)
+    results = {}
+    for name in names:
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = run_in_subprocess(name, os.path.abspath(args.scenarios_file))
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+    print_results(results, previous)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import pygame
+from game_clock import interpolate
 
 class Camera:
     def __init__(self, screen_width, screen_height, map_width, map_height, camera_speed=0.1):
@@ -6,8 +7,10 @@ class Camera:
         self.map_width = map_width
         self.map_height = map_height
         self.camera_speed = camera_speed
+        self.previous_position = self.camera.topleft  # Position before the last simulation step
 
     def update(self, target_rect):
+        self.previous_position = self.camera.topleft
         target_pos = pygame.Vector2(
             target_rect.centerx - self.camera.width // 2,
             target_rect.centery - self.camera.height // 2
@@ -22,6 +25,10 @@ class Camera:
         self.camera.right = min(self.map_width, self.camera.right)
         self.camera.bottom = min(self.map_height, self.camera.bottom)
 
+    def get_view(self, alpha):
+        # Camera rect for a frame rendered between the last two simulation steps
+        return pygame.Rect(interpolate(self.previous_position, self.camera.topleft, alpha), self.camera.size)
+
     def apply(self, rect):
         return rect.move(-self.camera.topleft)
 
@@ -0,0 +1,31 @@
+import weakref
+import pygame
+import pytmx
+from spatial_hash import SpatialHash
+
+COLLIDER_CELL_SIZE = 128
+
+_colliders = weakref.WeakKeyDictionary()
+
+
+def get_object_collider(obj):
+    # Collider covers only the lower part of the object, so the player can walk behind it
+    return pygame.Rect(obj.x + 10, obj.y + obj.height / 2.2, obj.width - 20, obj.height / 2)
+
+
+def get_static_colliders(tmx_data):
+    # Spatial hash of colliders of all map objects, built on first use
+    colliders = _colliders.get(tmx_data)
+    if colliders is None:
+        colliders = SpatialHash(COLLIDER_CELL_SIZE)
+        for layer in tmx_data.layers:
+            if isinstance(layer, pytmx.TiledObjectGroup):
+                for obj in layer:
+                    collider = get_object_collider(obj)
+                    colliders.insert(collider, collider)
+        _colliders[tmx_data] = colliders
+    return colliders
+
+
+def collides_with_objects(rect, tmx_data):
+    return get_static_colliders(tmx_data).collides(rect)
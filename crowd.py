@@ -0,0 +1,65 @@
+import numpy as np
+
+SEPARATION_STRENGTH = 0.5  # Part of the overlap removed in one update
+
+# Cell and the neighbour cells after it, so every pair of cells is visited once
+HALF_NEIGHBOURHOOD = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+
+def get_neighbour_pairs(centers_x, centers_y, cell_size):
+    # Index pairs (i, j) of points in the same or neighbouring grid cells, i < j within one cell
+    cells_x = np.floor_divide(centers_x, cell_size).astype(np.int64)
+    cells_y = np.floor_divide(centers_y, cell_size).astype(np.int64)
+    cells_x -= cells_x.min() - 1
+    cells_y -= cells_y.min() - 1
+    row = int(cells_y.max()) + 2
+    keys = cells_x * row + cells_y
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    pairs_i, pairs_j = [], []
+    for dx, dy in HALF_NEIGHBOURHOOD:
+        neighbour_keys = keys + dx * row + dy
+        starts = np.searchsorted(sorted_keys, neighbour_keys, side="left")
+        counts = np.searchsorted(sorted_keys, neighbour_keys, side="right") - starts
+        total = int(counts.sum())
+        if not total:
+            continue
+        # Expand every point into all points of its neighbour cell
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        i = np.repeat(np.arange(len(keys)), counts)
+        j = order[np.repeat(starts, counts) + np.arange(total) - first]
+        if (dx, dy) == (0, 0):
+            i, j = i[i < j], j[i < j]
+        pairs_i.append(i)
+        pairs_j.append(j)
+
+    if not pairs_i:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+
+def get_separation_offsets(centers_x, centers_y, min_distance):
+    # Offsets pushing points closer than min_distance apart, each point of a pair moves half of the way
+    centers_x = np.asarray(centers_x, dtype=np.float64)
+    centers_y = np.asarray(centers_y, dtype=np.float64)
+    offset_x, offset_y = np.zeros(len(centers_x)), np.zeros(len(centers_y))
+    if len(centers_x) < 2 or min_distance <= 0:
+        return offset_x, offset_y
+
+    i, j = get_neighbour_pairs(centers_x, centers_y, min_distance)
+    delta_x, delta_y = centers_x[j] - centers_x[i], centers_y[j] - centers_y[i]
+    distance = np.hypot(delta_x, delta_y)
+    close = distance < min_distance
+    i, j, delta_x, delta_y, distance = i[close], j[close], delta_x[close], delta_y[close], distance[close]
+
+    # Points on the same spot are pushed apart horizontally
+    same_spot = distance == 0
+    delta_x[same_spot], distance[same_spot] = 1, 1
+
+    push = (min_distance - distance) * SEPARATION_STRENGTH / 2 / distance
+    np.add.at(offset_x, i, -delta_x * push)
+    np.add.at(offset_y, i, -delta_y * push)
+    np.add.at(offset_x, j, delta_x * push)
+    np.add.at(offset_y, j, delta_y * push)
+    return offset_x, offset_y
@@ -0,0 +1,42 @@
+import pygame
+
+MAX_DIRTY_RECTS = 120  # Above this count one full flip is cheaper than many small updates
+
+
+class DirtyRectTracker:
+    def __init__(self, screen_rect):
+        self.screen_rect = pygame.Rect(screen_rect)
+        self.rects = []
+        self.previous_rects = []
+        self.last_camera_pos = None
+        self.full_update = True
+
+    def mark(self, rect):
+        # Remember a screen region which was changed in this frame
+        rect = self.screen_rect.clip(rect)
+        if rect.width and rect.height:
+            self.rects.append(rect)
+
+    def mark_all(self, rects):
+        for rect in rects:
+            self.mark(rect)
+
+    def request_full_update(self):
+        # Next frame is presented with a full flip (new map, closed pause screen)
+        self.full_update = True
+
+    def present(self, camera):
+        # Update regions changed in this and previous frame, flip when the camera scrolls
+        camera_moved = camera.topleft != self.last_camera_pos
+        self.last_camera_pos = camera.topleft
+
+        # Old positions must be updated too, so moved sprites do not leave a trail
+        rects = self.previous_rects + self.rects
+        if self.full_update or camera_moved or len(rects) > MAX_DIRTY_RECTS:
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)
+
+        self.previous_rects = self.rects
+        self.rects = []
+        self.full_update = False
@@ -0,0 +1,88 @@
+import numpy as np
+from tile_flags import get_tile_flags, WALKABLE
+
+UNREACHABLE = -1
+MAX_DISTANCE = 40  # Steps searched from the target, NPCs farther away chase the player directly
+
+# Neighbour offsets (dx, dy), orthogonal first so they win ties over diagonals
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, 1), (1, -1), (-1, -1))
+
+
+def shift(array, dx, dy, fill):
+    # Value of the neighbour (x + dx, y + dy) for every cell, fill outside of the map
+    shifted = np.full_like(array, fill)
+    height, width = array.shape
+    shifted[max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)] = \
+        array[max(0, dy):height - max(0, -dy), max(0, dx):width - max(0, -dx)]
+    return shifted
+
+
+class FlowField:
+    def __init__(self, tmx_data, max_distance=MAX_DISTANCE):
+        self.tmx_data = tmx_data
+        self.max_distance = max_distance
+        self.width, self.height = tmx_data.width, tmx_data.height
+        self.target = None
+        self.distances = np.full((self.height, self.width), UNREACHABLE, dtype=np.int32)
+        self.next_x = np.zeros((self.height, self.width), dtype=np.int32)  # Tile to step to from each tile
+        self.next_y = np.zeros((self.height, self.width), dtype=np.int32)
+
+    def update(self, target_x, target_y):
+        # Recompute the field only when the target moved to another tile
+        if (target_x, target_y) != self.target:
+            self.target = (target_x, target_y)
+            self.compute(target_x, target_y)
+
+    def compute(self, target_x, target_y):
+        # Breadth first search from the target over walkable tiles, whole wavefront at once
+        walkable = (get_tile_flags(self.tmx_data).flags & WALKABLE) != 0
+        distances = self.distances
+        distances.fill(UNREACHABLE)
+        if not (0 <= target_x < self.width and 0 <= target_y < self.height):
+            return
+
+        # Frontier padded by one tile, so neighbours are plain slices of it
+        frontier = np.zeros((self.height + 2, self.width + 2), dtype=bool)
+        frontier[target_y + 1, target_x + 1] = True
+        unvisited = walkable.copy()
+        unvisited[target_y, target_x] = False
+        distance = 0
+        distances[target_y, target_x] = distance
+        while distance < self.max_distance:
+            reached = frontier[:-2, 1:-1] | frontier[2:, 1:-1] | frontier[1:-1, :-2] | frontier[1:-1, 2:]
+            reached &= unvisited
+            if not reached.any():
+                break
+            distance += 1
+            distances[reached] = distance
+            unvisited &= ~reached
+            frontier[1:-1, 1:-1] = reached
+
+        # Every tile steps to its neighbour closest to the target, diagonals may not cut corners
+        ys, xs = np.indices(distances.shape, dtype=np.int32)
+        best = np.where(distances == UNREACHABLE, np.iinfo(np.int32).max, distances)
+        self.next_x[:], self.next_y[:] = xs, ys
+        for dx, dy in NEIGHBOURS:
+            neighbour = shift(distances, dx, dy, UNREACHABLE)
+            closer = (neighbour != UNREACHABLE) & (neighbour < best)
+            if dx and dy:
+                closer &= shift(walkable, dx, 0, False) & shift(walkable, 0, dy, False)
+            best = np.where(closer, neighbour, best)
+            self.next_x[closer] = xs[closer] + dx
+            self.next_y[closer] = ys[closer] + dy
+
+    def get_distance(self, tile_x, tile_y):
+        # Steps to the target, UNREACHABLE outside of the map or without a walkable path
+        if 0 <= tile_x < self.width and 0 <= tile_y < self.height:
+            return int(self.distances[tile_y, tile_x])
+        return UNREACHABLE
+
+    def get_next_tile(self, tile_x, tile_y):
+        # Next tile on the shortest path to the target, None if the target can not be reached
+        # Tiles outside of the walkable area step to a reachable neighbour when they have one
+        if not (0 <= tile_x < self.width and 0 <= tile_y < self.height) or self.target is None:
+            return None
+        next_tile = int(self.next_x[tile_y, tile_x]), int(self.next_y[tile_y, tile_x])
+        if next_tile == (tile_x, tile_y) and self.distances[tile_y, tile_x] != 0:
+            return None
+        return next_tile
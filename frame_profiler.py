@@ -0,0 +1,40 @@
+import time
+
+
+class FrameProfiler:
+    # Time spent in each part of the main loop, collected only while enabled by benchmark.py
+    def __init__(self):
+        self.enabled = False
+        self.frame_limit = None  # The main loop stops after this many frames
+        self.on_frame = None  # Called with the number of finished frames after every frame
+        self.frame_count = 0
+        self.frames = []  # Section name -> seconds, one entry per frame
+        self.sections = {}
+        self.frame_start = 0.0
+        self.last_time = 0.0
+
+    def begin_frame(self):
+        if self.enabled:
+            self.sections = {}
+            self.frame_start = self.last_time = time.perf_counter()
+
+    def lap(self, name):
+        # Time since the previous lap is added to the section, sections run in several steps are summed
+        if self.enabled:
+            now = time.perf_counter()
+            self.sections[name] = self.sections.get(name, 0.0) + now - self.last_time
+            self.last_time = now
+
+    def end_frame(self):
+        # Returns False when the frame limit is reached
+        if not self.enabled:
+            return True
+        self.sections["frame"] = time.perf_counter() - self.frame_start
+        self.frames.append(self.sections)
+        self.frame_count += 1
+        if self.on_frame is not None:
+            self.on_frame(self.frame_count)
+        return self.frame_limit is None or self.frame_count < self.frame_limit
+
+
+frame_profiler = FrameProfiler()
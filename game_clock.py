@@ -0,0 +1,69 @@
+import time
+
+TICK_RATE = 120  # Simulation steps per second, movement speeds are given per step
+MAX_FRAME_TIME = 0.25  # Longer frames are cut, so a stall does not end in a burst of steps
+MAX_TICKS_PER_FRAME = 12  # Under heavier load the game slows down instead of rendering less and less
+TIME_TOLERANCE = 1e-6  # Rounding errors of frame times must not delay a step to the next frame
+
+
+def interpolate(previous, current, alpha):
+    # Position between the last two simulation steps, rounded to whole pixels
+    if alpha >= 1 or previous == current:
+        return current
+    return (round(previous[0] + (current[0] - previous[0]) * alpha),
+            round(previous[1] + (current[1] - previous[1]) * alpha))
+
+
+class GameClock:
+    # Game time advanced in fixed simulation steps, it does not run while the game is paused
+    # real_time can be replaced, e.g. by a clock advancing exactly one step per frame for benchmarks
+    def __init__(self, tick_rate=TICK_RATE, real_time=time.perf_counter):
+        self.tick_rate = tick_rate
+        self.tick_length = 1 / tick_rate
+        self.real_time = real_time
+        self.tick_count = 0
+        self.accumulator = 0.0
+        self.last_real_time = None
+        self.paused = False
+
+    def time(self):
+        # Seconds of game time
+        return self.tick_count / self.tick_rate
+
+    def get_ticks(self):
+        # Milliseconds of game time, used like pygame.time.get_ticks
+        return self.tick_count * 1000 // self.tick_rate
+
+    def start(self):
+        # Measure frames from now, time spent loading or in menus is not simulated
+        self.paused = False
+        self.accumulator = 0.0
+        self.last_real_time = self.real_time()
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.start()
+
+    def advance(self):
+        # Number of simulation steps to run for the real time since the last frame
+        now = self.real_time()
+        if self.paused or self.last_real_time is None:
+            self.last_real_time = now
+            return 0
+        self.accumulator += min(now - self.last_real_time, MAX_FRAME_TIME)
+        self.last_real_time = now
+        ticks = min(int((self.accumulator + TIME_TOLERANCE) / self.tick_length), MAX_TICKS_PER_FRAME)
+        self.accumulator = min(max(self.accumulator - ticks * self.tick_length, 0.0), self.tick_length)
+        return ticks
+
+    def tick(self):
+        self.tick_count += 1
+
+    def get_alpha(self):
+        # How far the rendered frame is between the last step and the next one
+        return min(self.accumulator / self.tick_length, 1.0)
+
+
+game_clock = GameClock()
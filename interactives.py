@@ -0,0 +1,68 @@
+import pygame
+import pytmx
+from spatial_hash import SpatialHash
+
+INTERACTION_REACH = 10  # How much are object rects inflated for proximity checks
+INTERACTIVE_LAYER = "Structures"
+
+
+class ControlPanel:
+    def __init__(self, obj):
+        self.obj = obj
+        self.reach_rect = pygame.Rect(obj.x, obj.y, obj.width, obj.height).inflate(INTERACTION_REACH, INTERACTION_REACH)
+
+
+class Button:
+    def __init__(self, obj):
+        self.obj = obj
+        self.reach_rect = pygame.Rect(obj.x, obj.y, obj.width, obj.height).inflate(INTERACTION_REACH, INTERACTION_REACH)
+
+
+class TeleportTile:
+    def __init__(self, layer, x, y, gid):
+        self.layer = layer
+        self.x = x
+        self.y = y
+        self.gid = gid  # Inactive teleport gid, its second frame is the active teleport
+
+
+class InteractiveRegistry:
+    def __init__(self, tmx_data):
+        self.control_panels = []
+        self.buttons = []
+        self.teleports = []
+        self.index = SpatialHash(128)  # Reach rects of panels and buttons
+        self.listeners = {}
+
+        for layer in tmx_data.layers:
+            if isinstance(layer, pytmx.TiledObjectGroup) and layer.name == INTERACTIVE_LAYER:
+                for obj in layer:
+                    if hasattr(obj, 'properties') and 'controllPanel' in obj.properties:
+                        self.add(ControlPanel(obj), self.control_panels)
+                    elif hasattr(obj, 'properties') and 'button' in obj.properties:
+                        self.add(Button(obj), self.buttons)
+
+        for layer in tmx_data.visible_layers:
+            if isinstance(layer, pytmx.TiledTileLayer):
+                for x, y, gid in layer:
+                    tile_properties = tmx_data.get_tile_properties_by_gid(gid) if gid else None
+                    if tile_properties and 'frames' in tile_properties and 'teleport' in tile_properties:
+                        self.teleports.append(TeleportTile(layer, x, y, gid))
+
+    def add(self, handle, handles):
+        handles.append(handle)
+        self.index.insert(handle, handle.reach_rect)
+
+    def get_near(self, player_rect, handle_type):
+        # Panels or buttons whose reach rect collides with the player
+        return [handle for handle in self.index.query(player_rect) if isinstance(handle, handle_type)]
+
+    def subscribe(self, event_name, callback):
+        # A warm level is subscribed again when it is played again, callbacks are added once
+        listeners = self.listeners.setdefault(event_name, [])
+        if callback not in listeners:
+            listeners.append(callback)
+
+    def publish(self, event_name, **event_data):
+        for callback in self.listeners.get(event_name, ()):
+            callback(**event_data)
@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from tile_flags import get_tile_flags
+
+WAIT_STEP = 1 / 60  # How long the render thread waits for the worker between progress screens
+MEMORY_CATEGORIES = ("tiles", "chunks", "npc_assets", "indices")
+
+
+def get_surface_bytes(surfaces):
+    # Pixel memory of unique surfaces, subsurfaces share the pixels of their parent (e.g. an atlas page)
+    unique = {id(surface): surface for surface in surfaces if surface is not None}
+    return sum(surface.get_pitch() * surface.get_height() for surface in unique.values() if surface.get_parent() is None)
+
+
+def get_array_bytes(*owners):
+    # NumPy arrays held in attributes of the owners
+    return sum(value.nbytes for owner in owners for value in vars(owner).values() if isinstance(value, np.ndarray))
+
+
+class Level:
+    # Everything prepared for switching the game to a map, owns the surfaces, indices and entities of it
+    def __init__(self, map_file, tmx_data, map_instance, npc_manager, spawn_position):
+        self.map_file = map_file
+        self.tmx_data = tmx_data
+        self.map_instance = map_instance
+        self.npc_manager = npc_manager
+        self.spawn_position = spawn_position
+
+    def get_resident_memory(self):
+        # Bytes held by the level per category, assets shared with other levels are counted for each of them
+        memory = dict.fromkeys(MEMORY_CATEGORIES, 0)
+        if self.tmx_data is None:
+            return memory
+        memory["tiles"] = get_surface_bytes(self.tmx_data.images)
+        memory["chunks"] = get_surface_bytes(self.map_instance.tile_cache.surfaces.values())
+        memory["indices"] = get_array_bytes(get_tile_flags(self.tmx_data))
+        if self.npc_manager is not None:
+            manager = self.npc_manager
+            frames = [frame for animations in (manager.animations, manager.flipped_animations) for frames in animations.values() for frame in frames]
+            memory["npc_assets"] = get_surface_bytes(frames + [manager.heart_image])
+            memory["indices"] += get_array_bytes(manager, manager.flow_field, manager.spawn_pool)
+        return memory
+
+    def release(self):
+        # Free everything of the level, it can not be played afterwards
+        if self.tmx_data is None:
+            return
+        if self.npc_manager is not None:
+            self.npc_manager.release_assets()
+        self.map_instance.tile_cache.release()
+        self.tmx_data.images = []
+        self.tmx_data = self.map_instance = self.npc_manager = None  # Flags and colliders of the map go with it
+
+
+class LevelCache:
+    # Recently left levels kept warm under a memory budget in bytes, the least recently used are released first
+    # A warm level comes back in the state it was left in
+    def __init__(self, budget):
+        self.budget = budget
+        self.levels = OrderedDict()  # Map file -> level, least recently used first
+
+    def __contains__(self, map_file):
+        return map_file in self.levels
+
+    def take(self, map_file):
+        # Cached level for the map or None, it is not cached anymore while it is played
+        return self.levels.pop(map_file, None)
+
+    def store(self, level):
+        self.levels[level.map_file] = level
+        self.levels.move_to_end(level.map_file)
+        self.evict()
+
+    def evict(self):
+        while self.levels and self.get_resident_memory() > self.budget:
+            _, level = self.levels.popitem(last=False)
+            level.release()
+
+    def get_resident_memory(self):
+        return sum(sum(level.get_resident_memory().values()) for level in self.levels.values())
+
+    def get_memory_report(self, current_level=None):
+        # Map file -> bytes per category of every cached level and the played one
+        levels = list(self.levels.values()) + ([current_level] if current_level is not None else [])
+        return {level.map_file: level.get_resident_memory() for level in levels}
+
+    def clear(self):
+        while self.levels:
+            self.levels.popitem(last=False)[1].release()
+
+
+class LevelPreloader:
+    # Prepares the next level in a worker thread while the current one is still played
+    # prepare_level(map_file, report_progress) builds the level, release_level(level) frees an unused one
+    def __init__(self, prepare_level, release_level):
+        self.prepare_level = prepare_level
+        self.release_level = release_level
+        self.lock = threading.Lock()
+        self.map_file = None
+        self.thread = None
+        self.level = None
+        self.error = None
+        self.progress = 0.0
+
+    def preload(self, map_file):
+        # Start preparing the level, a level prepared for another map is dropped
+        if map_file == self.map_file:
+            return
+        self.discard()
+        with self.lock:
+            self.map_file = map_file
+            self.progress = 0.0
+        self.thread = threading.Thread(target=self.run, args=(map_file,), name=f"preload {map_file}", daemon=True)
+        self.thread.start()
+
+    def preload_first(self, map_files, level_cache=()):
+        # Start preparing the first real map of an opened portal, a level still warm in the cache is not prepared again
+        for map_file in map_files:
+            if map_file and map_file != "end":
+                if map_file not in level_cache:
+                    self.preload(map_file)
+                return map_file
+        return None
+
+    def run(self, map_file):
+        def report_progress(progress):
+            with self.lock:
+                if self.map_file == map_file:
+                    self.progress = progress
+
+        level, error = None, None
+        try:
+            level = self.prepare_level(map_file, report_progress)
+        except Exception as exception:  # The render thread prepares the level again when it is taken
+            error = exception
+        with self.lock:
+            if self.map_file == map_file:
+                self.level, self.error, self.progress = level, error, 1.0
+                return
+        if level is not None:
+            self.release_level(level)  # Preload was dropped while it was running
+
+    def is_ready(self, map_file):
+        with self.lock:
+            return self.map_file == map_file and (self.level is not None or self.error is not None)
+
+    def take(self, map_file, show_progress=None):
+        # Prepared level for the map, waits for the worker and calls show_progress(progress) meanwhile
+        # Maps which were not preloaded or failed to preload are prepared right away
+        show_progress = show_progress or (lambda progress: None)
+        if map_file != self.map_file:
+            self.discard()
+            return self.prepare_level(map_file, show_progress)
+
+        while not self.is_ready(map_file):
+            show_progress(self.progress)
+            self.thread.join(WAIT_STEP)
+
+        with self.lock:
+            level, error = self.level, self.error
+            self.map_file, self.level, self.error, self.thread = None, None, None, None
+        if error is not None:
+            return self.prepare_level(map_file, show_progress)
+        return level
+
+    def discard(self):
+        # Drop the preloaded level, a running worker releases its level when it finishes
+        with self.lock:
+            level = self.level
+            self.map_file, self.level, self.error, self.thread = None, None, None, None
+        if level is not None:
+            self.release_level(level)
@@ -1,14 +1,20 @@
 import pygame
-import time
 import screens
-from pytmx.util_pygame import load_pygame
+from map_package import load_map
 from npc import NPCManager
+from npc_swarm import SwarmNPCManager
 from player import Player
-from abilities import AbilitySystem
+from abilities import AbilitySystem, release_rotated_frames
 from utils import get_spawn_position
+from colliders import get_static_colliders
+from level_loader import Level, LevelCache, LevelPreloader
+from audio import audio
+from game_clock import game_clock
+from frame_profiler import frame_profiler
 from stats import StaminaBar, AbilityDisplay, HealthBar, TimerDisplay
 import map
 from camera import Camera
+from dirty_rects import DirtyRectTracker
 
 pygame.init()
 
@@ -18,14 +24,27 @@ player_size = 50
 camera_speed = 0.1
 TIME_LIMIT = 120
 SWITCH_COOLDOWN = 200
+MAX_FPS = 120  # Rendering limit, the game itself advances in fixed steps of game_clock
 FONT = pygame.font.SysFont(None, 45)
+DIRTY_RECT_RENDERING = False  # Update only changed screen regions while the camera stands still
+SWARM_NPCS = False  # Simulate NPCs in NumPy arrays, for levels with hundreds of enemies
+LEVEL_CACHE_BUDGET = 128 * 1024 * 1024  # Bytes of left levels kept warm for going back, 0 releases a level when it is left
+LEVEL_MEMORY_REPORT = False  # Print resident memory of the levels on every level switch
+
+# NPC settings of each map: spawn interval, max enemies, min distance, assets, size, hp, damage
+LEVEL_NPCS = {
+    "Assets/Maps/LavaPlace/Map/LavaPlace.tmx": (0, 40, 40, "Assets/Maps/LavaPlace/Npc/Demon", 50, 40, 5),
+    "Assets/Maps/AirPlace/Map/AirPlace.tmx": (0, 30, 40, "Assets/Maps/AirPlace/Npc/AirGolem", 85, 50, 8),
+    "Assets/Maps/SnowPlace/Map/SnowPlace.tmx": (0, 30, 40, "Assets/Maps/SnowPlace/Npc/IceGolem", 85, 60, 12),
+    "Assets/Maps/DirtPlace/Map/DirtPlace.tmx": (0, 25, 40, "Assets/Maps/DirtPlace/Npc/DirtGolem", 85, 70, 14),
+}
 
 # Screen setup
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 
 # Map and player initialization
 map_file = "Assets/Maps/LavaPlace/Map/LavaPlace.tmx"
-tmx_data = load_pygame(map_file)
+tmx_data = load_map(map_file)
 map_width, map_height = tmx_data.width * tmx_data.tilewidth, tmx_data.height * tmx_data.tileheight
 spawn_x, spawn_y = get_spawn_position(tmx_data)
 player = Player(player_size, "Assets/Player", spawn_x - 10, spawn_y - player_size / 2)
@@ -37,13 +56,17 @@ timer_display = TimerDisplay(TIME_LIMIT)
 
 # Camera initialization
 camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, map_width, map_height, camera_speed)
+dirty_rects = DirtyRectTracker(screen.get_rect())
 
 # Map initialization
 map_instance = map.Map(tmx_data, TIME_LIMIT)
 floating_text_group = pygame.sprite.Group()
 
 # NPC management
-npc_manager = NPCManager(floating_text_group, tmx_data, 0, 40, 40, "Assets/Maps/LavaPlace/Npc/Demon", 50, 40, 5)
+npc_manager_type = SwarmNPCManager if SWARM_NPCS else NPCManager
+npc_manager = npc_manager_type(floating_text_group, tmx_data, *LEVEL_NPCS[map_file])
+current_level = Level(map_file, tmx_data, map_instance, npc_manager, (spawn_x, spawn_y))
+level_cache = LevelCache(LEVEL_CACHE_BUDGET)
 npc_spawned_once = False
 spawn_npcs = False
 
@@ -53,168 +76,236 @@ selected_ability_display = AbilityDisplay(ability_system)
 
 # Main loop
 clock = pygame.time.Clock()
-start_time = time.time()
+start_time = game_clock.time()
 running = True
 last_switch_time = 0
 
 # Načítanie a prehrávanie hudby
 pygame.mixer.init()
-pygame.mixer.music.load("Assets/Sounds/Music/background_music.mp3")  # Cesta k hudobnému súboru
-pygame.mixer.music.set_volume(0.1)  # Nastavenie hlasitosti (0.0 - 1.0)
-pygame.mixer.music.play(-1)  # -1 znamená nepretržité prehrávanie
+audio.preload()  # Hudba aj zvuky sa dekódujú iba raz
+audio.play_music("background", fade_ms=0)  # Hudba sa prehráva nepretržite
 
 end = False
 
-def load_new_map(new_map_file):
-    global tmx_data, map_width, map_height, map_instance, npc_manager, camera
+def prepare_level(map_file, report_progress):
+    # Runs in the preloading thread, so it must not change the level being played
+    level_tmx_data = load_map(map_file)
+    report_progress(0.4)
+    level_map = map.Map(level_tmx_data, TIME_LIMIT)
+    report_progress(0.7)
+    level_npc_manager = npc_manager_type(floating_text_group, level_tmx_data, *LEVEL_NPCS[map_file])
+    report_progress(0.9)
+    get_static_colliders(level_tmx_data)  # Built before the player moves on the map
+    spawn_position = get_spawn_position(level_tmx_data)
+
+    # Camera glides from the map corner to the spawn, chunks seen on the way are baked now
+    start_view = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+    spawn_view = start_view.move(spawn_position[0] - SCREEN_WIDTH // 2, spawn_position[1] - SCREEN_HEIGHT // 2)
+    level_map.tile_cache.bake_area(start_view.union(spawn_view))
+    report_progress(1.0)
+    return Level(map_file, level_tmx_data, level_map, level_npc_manager, spawn_position)
+
+def release_level(level):
+    # Free a preloaded level which was not used
+    level.release()
+
+level_preloader = LevelPreloader(prepare_level, release_level)
+
+def on_portal_opened(target_maps=()):
+    global spawn_npcs, npc_spawned_once
+
+    # Stop the timer and despawn NPCs when all buttons were turned off in time
+    timer_display.reset()
+    spawn_npcs = False
+    npc_spawned_once = False
+    npc_manager.despawn_all_npcs()
+
+    # The player is going to step on the teleport, start preparing the level behind it unless it is still warm
+    level_preloader.preload_first(target_maps, level_cache)
+
+def subscribe_map_events():
+    map_instance.interactives.subscribe("portal_opened", on_portal_opened)
 
-    # Load a new map
-    tmx_data = load_pygame(new_map_file)
+def load_new_map(new_map_file):
+    global tmx_data, map_width, map_height, map_instance, npc_manager, camera, current_level
+
+    # Take a warm level left before or the preloaded one, the loading screen is shown if it is not prepared yet
+    level = level_cache.take(new_map_file) or level_preloader.take(new_map_file, screens.loading_screen)
+    level_cache.store(current_level)  # Kept while it fits into the budget
+    current_level = level
+    release_rotated_frames()  # Projectile rotations of the left level are not kept across levels
+    tmx_data = level.tmx_data
     map_width, map_height = tmx_data.width * tmx_data.tilewidth, tmx_data.height * tmx_data.tileheight
 
     # Update objects dependent on the map
-    map_instance = map.Map(tmx_data, TIME_LIMIT)
-    if new_map_file == "Assets/Maps/AirPlace/Map/AirPlace.tmx":
-        npc_manager = NPCManager(floating_text_group, tmx_data, 0, 30, 40, "Assets/Maps/AirPlace/Npc/AirGolem", 85, 50, 8)
-    elif new_map_file == "Assets/Maps/SnowPlace/Map/SnowPlace.tmx":
-        npc_manager = NPCManager(floating_text_group, tmx_data, 0, 30, 40, "Assets/Maps/SnowPlace/Npc/IceGolem", 85, 60, 12)
-    elif new_map_file == "Assets/Maps/DirtPlace/Map/DirtPlace.tmx":
-        npc_manager = NPCManager(floating_text_group, tmx_data, 0, 25, 40, "Assets/Maps/DirtPlace/Npc/DirtGolem", 85, 70, 14)
+    map_instance = level.map_instance
+    subscribe_map_events()
+    npc_manager = level.npc_manager
 
     camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, map_width, map_height, camera_speed)
 
     # Get new spawn position
-    spawn_x, spawn_y = get_spawn_position(tmx_data)
+    spawn_x, spawn_y = level.spawn_position
     player.rect.topleft = (spawn_x - 10, spawn_y - player_size / 2)
     player.bottom_half_rect.topleft = (spawn_x - 10, spawn_y - player_size / 2 + player_size // 2)
 
     # Camera initialize for new map
     camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, map_width, map_height, camera_speed)
     camera.update(player.rect)
+    dirty_rects.request_full_update()
+
+    if LEVEL_MEMORY_REPORT:
+        for level_file, memory in level_cache.get_memory_report(current_level).items():
+            details = ", ".join(f"{category} {size / 1024 / 1024:.1f} MB" for category, size in memory.items())
+            print(f"{level_file}: {sum(memory.values()) / 1024 / 1024:.1f} MB ({details})")
+        print(f"Sounds and music: {audio.get_resident_memory() / 1024 / 1024:.1f} MB")
 
+subscribe_map_events()
 screens.intro_screen()
+game_clock.start()
 
 while running:
+    frame_profiler.begin_frame()
 
     for event in pygame.event.get():
         if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-            pygame.mixer.music.stop()
+            audio.stop_music()
+            game_clock.pause()  # Game time stands still in the pause menu
             screens.pause_screen()
+            game_clock.resume()
+            dirty_rects.request_full_update()
         elif event.type == pygame.MOUSEWHEEL:
             if event.y > 0:  # Mouse wheel up
                 ability_system.switch_ability_backward()
             elif event.y < 0:  # Mouse wheel down
                 ability_system.switch_ability_forward()
-
-    screen.fill((0, 0, 0))
-
-    if timer_display.start_timer is not None:
-        elapsed_time = time.time() - timer_display.start_timer
-        if elapsed_time >= timer_display.time_limit or map_instance.stopTimer or player.is_dead:
-            # Reset timer
-            timer_display.reset()
-
-            # Reset controll panel
-            map_instance.reset_control_panel(player)
-            map_instance.stopTimer = False
-
-            # Despawn NPCs
-            spawn_npcs = False
-            npc_spawned_once = False
-            npc_manager.despawn_all_npcs()
-
-            # Load background music
-            pygame.mixer.music.load("Assets/Sounds/Music/background_music.mp3")
-            pygame.mixer.music.play(-1)
-            pygame.mixer.music.set_volume(0.1)
-
-            # Respawn if player died
-            if player.is_dead:
-                spawn_x, spawn_y = get_spawn_position(tmx_data)
-                player.rect.topleft = (spawn_x - 10, spawn_y - player_size / 2)
-                player.bottom_half_rect.topleft = (spawn_x - 10, spawn_y - player_size / 2 + player_size // 2)
-                player.is_dead = False
-
-    # Check teleports
-    if player.is_teleported() and player.new_map != "end":
-        load_new_map(player.new_map)
-        player.teleported = False
-        player.new_map = ""
-    elif player.is_teleported() and player.new_map == "end":
-        end = True
+    frame_profiler.lap("events")
+
+    # Simulate fixed steps for the time since the last frame, more of them when rendering falls behind
+    for _ in range(game_clock.advance()):
+        if timer_display.start_timer is not None:
+            elapsed_time = game_clock.time() - timer_display.start_timer
+            if elapsed_time >= timer_display.time_limit or player.is_dead:
+                # Reset timer
+                timer_display.reset()
+
+                # Reset controll panel
+                map_instance.reset_control_panel(player)
+
+                # Despawn NPCs
+                spawn_npcs = False
+                npc_spawned_once = False
+                npc_manager.despawn_all_npcs()
+
+                # Switch back to background music
+                audio.play_music("background")
+
+                # Respawn if player died
+                if player.is_dead:
+                    spawn_x, spawn_y = get_spawn_position(tmx_data)
+                    player.rect.topleft = (spawn_x - 10, spawn_y - player_size / 2)
+                    player.bottom_half_rect.topleft = (spawn_x - 10, spawn_y - player_size / 2 + player_size // 2)
+                    player.is_dead = False
+
+        # Check teleports
+        if player.is_teleported() and player.new_map != "end":
+            load_new_map(player.new_map)
+            player.teleported = False
+            player.new_map = ""
+            game_clock.start()  # Time spent loading the level is not simulated
+        elif player.is_teleported() and player.new_map == "end":
+            end = True
+            break
+        frame_profiler.lap("level")
+
+        # Handle key inputs and player actions
+        keys = pygame.key.get_pressed()
+        player.handle_movement(keys, tmx_data, camera.camera.x, camera.camera.y)
+        frame_profiler.lap("player")
+
+        # Handle mouse events for shooting the projectile
+        if pygame.mouse.get_pressed()[0]:  # Left mouse button
+            ability_system.trigger_ability(player.rect.centerx, player.rect.centery, *camera.get_offset())
+
+        # Update projectiles and check for collisions with NPCs
+        ability_system.update_abilities(npc_manager)
+        frame_profiler.lap("ability_update")
+
+        # Ability switching by keys 1-4
+        if keys[pygame.K_1]:
+            ability_system.select_ability_by_index(0)
+        elif keys[pygame.K_2]:
+            ability_system.select_ability_by_index(1)
+        elif keys[pygame.K_3]:
+            ability_system.select_ability_by_index(2)
+        elif keys[pygame.K_4]:
+            ability_system.select_ability_by_index(3)
+
+        # Control panel interaction
+        if keys[pygame.K_f]:
+            if map_instance.is_near_control_panel(player.rect) and not map_instance.controll_panel_on:
+                map_instance.turn_on_buttons()
+                map_instance.controll_panel_on = True
+                map_instance.start_timer = game_clock.time()
+                timer_display.start()
+                if not npc_spawned_once:  # Spawn NPC only once
+                    spawn_npcs = True
+                    npc_spawned_once = True
+
+            elif map_instance.is_near_button(player.rect):
+                map_instance.turn_off_button(player.rect)
+
+        # Update camera and NPCs
+        camera.update(player.rect)
+        frame_profiler.lap("interactions")
+        if spawn_npcs:
+            npc_manager.update(player, camera.camera.x, camera.camera.y)
+        frame_profiler.lap("npc_update")
+
+        game_clock.tick()
+
+    if end:
         break
 
-    # Handle key inputs and player actions
-    keys = pygame.key.get_pressed()
-    player.handle_movement(keys, tmx_data, camera.camera.x, camera.camera.y)
-
-
-    # Handle mouse events for shooting the projectile
-    mouse_x, mouse_y = pygame.mouse.get_pos()
-    if pygame.mouse.get_pressed()[0]:  # Left mouse button
-        ability_system.trigger_ability(player.rect.centerx, player.rect.centery, *camera.get_offset())
-
-    # Update projectiles and check for collisions with NPCs
-    ability_system.update_abilities(npc_manager.npcs)
-
-
-    # Ability switching by keys 1-4
-    if keys[pygame.K_1]:
-        ability_system.select_ability_by_index(0)
-    elif keys[pygame.K_2]:
-        ability_system.select_ability_by_index(1)
-    elif keys[pygame.K_3]:
-        ability_system.select_ability_by_index(2)
-    elif keys[pygame.K_4]:
-        ability_system.select_ability_by_index(3)
-
-    # Control panel interaction
-    if keys[pygame.K_f]:
-        if map_instance.is_near_control_panel(player.rect) and not map_instance.controll_panel_on:
-            map_instance.turn_on_buttons()
-            map_instance.controll_panel_on = True
-            map_instance.start_timer = time.time()
-            timer_display.start()
-            if not npc_spawned_once:  # Spawn NPC only once
-                spawn_npcs = True
-                npc_spawned_once = True
-
-        elif map_instance.is_near_button(player.rect):
-            map_instance.turn_off_button(player.rect)
-
-    if map_instance.despawn_npcs:
-        spawn_npcs = False
-        npc_spawned_once = False
-        npc_manager.despawn_all_npcs()
-
-    # Update camera and render everything
-    camera.update(player.rect)
-    map_instance.render_map_tiles(screen, tmx_data, camera.camera, start_time)
-    map_instance.render_map_objects(screen, tmx_data, player, camera.camera, start_time)
+    # Render the game between its last two simulation steps
+    alpha = game_clock.get_alpha()
+    view = camera.get_view(alpha)
+    screen.fill((0, 0, 0))
+    dirty_rects.mark_all(map_instance.render_map_tiles(screen, tmx_data, view, start_time))
+    frame_profiler.lap("tiles")
+    dirty_rects.mark_all(map_instance.render_map_objects(screen, tmx_data, player, view, start_time, alpha))
+    frame_profiler.lap("objects")
 
     # Draw projectiles
-    ability_system.draw_abilities(screen, *camera.get_offset())
+    dirty_rects.mark_all(ability_system.draw_abilities(screen, *view.topleft, alpha))
+    frame_profiler.lap("ability_draw")
 
-    # Update and draw NPCs
+    # Draw NPCs
     if spawn_npcs:
-        npc_manager.update(player, camera.camera.x, camera.camera.y)
-        npc_manager.draw(screen, camera.camera)
-
-    # Player collision detection
-    player.check_collision_with_objects(player.rect, tmx_data, camera.camera.x, camera.camera.y)
+        dirty_rects.mark_all(npc_manager.draw(screen, view, alpha))
+    frame_profiler.lap("npc_draw")
 
     # Update and draw floating texts
-    floating_text_group.update(camera.camera.x, camera.camera.y)
+    floating_text_group.update(view.x, view.y)
     floating_text_group.draw(screen)
+    dirty_rects.mark_all(floating_text.rect for floating_text in floating_text_group)
+    frame_profiler.lap("text")
 
     # Draw UI elements
-    stamina_bar.draw(screen, 20, SCREEN_HEIGHT - 40, 220, 25)
-    health_bar.draw(screen, SCREEN_WIDTH-240, 20, 220, 25)
-    selected_ability_display.draw(screen, 15, 15)
-    timer_display.draw(screen, SCREEN_WIDTH/2, 20)
-
-    pygame.display.flip()
-    clock.tick(120)
+    dirty_rects.mark(stamina_bar.draw(screen, 20, SCREEN_HEIGHT - 40, 220, 25))
+    dirty_rects.mark(health_bar.draw(screen, SCREEN_WIDTH-240, 20, 220, 25))
+    dirty_rects.mark(selected_ability_display.draw(screen, 15, 15))
+    dirty_rects.mark(timer_display.draw(screen, SCREEN_WIDTH/2, 20))
+    frame_profiler.lap("hud")
+
+    if DIRTY_RECT_RENDERING:
+        dirty_rects.present(view)
+    else:
+        pygame.display.flip()
+    frame_profiler.lap("present")
+
+    running = frame_profiler.end_frame()  # Benchmarks stop after their number of frames
+    clock.tick(0 if frame_profiler.enabled else MAX_FPS)  # Benchmarks are not limited to MAX_FPS
 
 if end:
     screens.game_over_screen()
@@ -1,6 +1,13 @@
-import time
+import math
 import pytmx
 import pygame
+from spatial_hash import SpatialHash
+from interactives import InteractiveRegistry, ControlPanel, Button
+from tile_animation import AnimatedTileIndex
+from tile_cache import TileChunkCache
+from tile_flags import get_tile_flags
+from audio import audio
+from game_clock import game_clock
 
 
 class Map:
@@ -10,197 +17,168 @@ class Map:
         self.btn_off_count = 0
         self.start_timer = None
         self.time_limit = time_limit
-        self.despawn_npcs = False
-        self.stopTimer = False
 
-        # Load sound effects
-        self.interaction_click_sound = pygame.mixer.Sound("Assets/Sounds/Controll_panel/interaction_click.mp3")
-        self.portal_open_sound = pygame.mixer.Sound("Assets/Sounds/Controll_panel/portal_open.mp3")
-        self.interaction_click_sound.set_volume(0.4)
-        self.portal_open_sound.set_volume(0.8)
+        # Animation timelines and static tile layers pre-rendered into chunks
+        self.animation_index = AnimatedTileIndex(tmx_data)
+        self.tile_cache = TileChunkCache(tmx_data, self.animation_index)
+
+        # Grid of object bounds for culling objects outside of the camera
+        self.object_index = SpatialHash(256)
+        for layer in tmx_data.layers:
+            if isinstance(layer, pytmx.TiledObjectGroup):
+                for obj in layer:
+                    self.object_index.insert(obj, self.get_object_bounds(obj))
+        self.shown_object_gids = {}  # Gid of each object drawn by the last render
+
+        # Control panel, buttons and teleports with events about their state changes
+        self.interactives = InteractiveRegistry(tmx_data)
 
 
     def get_animated_gid(self, tmx_data, gid, elapsed_time):
         # Return the GID for animated tiles based on elapsed time
-        tile_properties = tmx_data.get_tile_properties_by_gid(gid)
-        if tile_properties and "frames" in tile_properties:
-            animation_frames = tile_properties["frames"]
-            total_duration = sum(frame[1] for frame in animation_frames)
-            if total_duration > 0:
-                current_time = elapsed_time % total_duration
-                frame_duration_sum = 0
-                for frame_gid, duration in animation_frames:
-                    frame_duration_sum += duration
-                    if current_time < frame_duration_sum:
-                        return frame_gid
-        return gid
+        return self.animation_index.get_frame_gid(gid, elapsed_time)
 
     def render_map_tiles(self, screen, tmx_data, camera, start_time):
-        # Render map tiles based on camera position
-        tile_width, tile_height = tmx_data.tilewidth, tmx_data.tileheight
-        start_x, end_x = max(0, camera.left // tile_width), min(tmx_data.width, (camera.right // tile_width) + 1)
-        start_y, end_y = max(0, camera.top // tile_height), min(tmx_data.height, (camera.bottom // tile_height) + 1)
-
-        elapsed_time = (time.time() - start_time) * 1000
-        for layer in tmx_data.layers:
-            if isinstance(layer, pytmx.TiledTileLayer):
-                for x, y, gid in layer:
-                    if start_x <= x < end_x and start_y <= y < end_y and gid != 0:
-                        gid = self.get_animated_gid(tmx_data, gid, elapsed_time)
-                        tile_image = tmx_data.get_tile_image_by_gid(gid)
-                        if tile_image:
-                            screen.blit(tile_image, (x * tile_width - camera.x, y * tile_height - camera.y))
-
-    def render_map_objects(self, screen, tmx_data, player, camera, start_time):
-        # Render map objects above and below the player
-        elapsed_time = (time.time() - start_time) * 1000
+        # Render pre-rendered tile chunks and animated tiles based on camera position
+        elapsed_time = (game_clock.time() - start_time) * 1000
+        return self.tile_cache.render(screen, camera, elapsed_time)
+
+    def set_tile_gid(self, layer, x, y, gid):
+        # Change a tile, rebake the chunk it belongs to and update its flags
+        layer.data[y][x] = gid
+        self.tile_cache.invalidate_tile(layer, x, y)
+        get_tile_flags(self.tmx_data).refresh_tile(x, y)
+
+    def get_object_bounds(self, obj):
+        # Area where the object can be drawn, objects without image are drawn as 50x50 rect
+        width, height = max(obj.width, 50), max(obj.height, 50)
+        tile_image = self.tmx_data.get_tile_image_by_gid(obj.gid) if obj.gid else None
+        if tile_image:
+            width, height = max(width, tile_image.get_width()), max(height, tile_image.get_height())
+        return pygame.Rect(math.floor(obj.x), math.floor(obj.y), math.ceil(width) + 1, math.ceil(height) + 1)
+
+    def render_map_objects(self, screen, tmx_data, player, camera, start_time, alpha=1.0):
+        # Render map objects visible by camera above and below the player
+        # Returns screen rects of the player and objects whose image changed since the last render
+        elapsed_time = (game_clock.time() - start_time) * 1000
+        player_rect = player.get_render_rect(alpha)
         above_player, below_player = [], []
-
-        for layer in tmx_data.layers:
-            if isinstance(layer, pytmx.TiledObjectGroup):
-                for obj in layer:
-                    x_pos, y_pos = obj.x - camera.x, obj.y - camera.y
-                    if hasattr(obj, "gid"):
-                        gid = self.get_animated_gid(tmx_data, obj.gid, elapsed_time)
-                        tile_image = tmx_data.get_tile_image_by_gid(gid)
-                        if tile_image:
-                            (above_player if y_pos + obj.height / 2 < player.rect.centery - camera.y else below_player).append((tile_image, x_pos, y_pos))
-                    else:
-                        (above_player if y_pos + obj.height / 2 < player.rect.centery - camera.y else below_player).append((None, x_pos, y_pos))
+        changed_rects = []
+
+        for obj in self.object_index.query(camera):
+            x_pos, y_pos = obj.x - camera.x, obj.y - camera.y
+            if hasattr(obj, "gid"):
+                gid = self.get_animated_gid(tmx_data, obj.gid, elapsed_time)
+                tile_image = tmx_data.get_tile_image_by_gid(gid)
+                if self.shown_object_gids.get(id(obj)) != gid:
+                    self.shown_object_gids[id(obj)] = gid
+                    changed_rects.append(self.get_object_bounds(obj).move(-camera.x, -camera.y))
+                if tile_image:
+                    (above_player if y_pos + obj.height / 2 < player_rect.centery - camera.y else below_player).append((tile_image, x_pos, y_pos))
+            else:
+                (above_player if y_pos + obj.height / 2 < player_rect.centery - camera.y else below_player).append((None, x_pos, y_pos))
 
         for tile_image, x_pos, y_pos in above_player:
             screen.blit(tile_image, (x_pos, y_pos)) if tile_image else pygame.draw.rect(screen, (0, 255, 0), pygame.Rect(x_pos, y_pos, 50, 50), 2)
-        screen.blit(player.image, player.rect.move(-camera.x, -camera.y))
+        changed_rects.append(screen.blit(player.image, player_rect.move(-camera.x, -camera.y)))
         for tile_image, x_pos, y_pos in below_player:
             screen.blit(tile_image, (x_pos, y_pos)) if tile_image else pygame.draw.rect(screen, (0, 255, 0), pygame.Rect(x_pos, y_pos, 50, 50), 2)
+        return changed_rects
 
     def turn_on_buttons(self):
         # Activate buttons, change animations, and start fight music
-        pygame.mixer.music.load("Assets/Sounds/Music/fight_music.mp3")
-        pygame.mixer.music.play(-1)
-        pygame.mixer.music.set_volume(0.2)
-        elapsed_time = (time.time() - time.time()) * 1000
-        for layer in self.tmx_data.layers:
-            if isinstance(layer, pytmx.TiledObjectGroup) and layer.name == "Structures":
-                for obj in layer:
-                    if hasattr(obj, 'properties') and 'button' in obj.properties:
-                        current_gid = obj.gid
-                        current_gid = self.get_animated_gid(self.tmx_data, current_gid, elapsed_time)
-                        tile_properties = self.tmx_data.get_tile_properties_by_gid(current_gid)
-                        if tile_properties and 'frames' in tile_properties and obj.properties['button'] == 0:
-                            animation_frames = tile_properties['frames']
-                            next_frame_gid = animation_frames[1][0]
-                            obj.gid = next_frame_gid
-                            obj.properties['button'] = 1
-        self.interaction_click_sound.play()
+        audio.play_music("fight")
+        for button in self.interactives.buttons:
+            obj = button.obj
+            current_gid = self.animation_index.get_frame_gid(obj.gid, 0)
+            animation_frames = self.animation_index.get_frames(current_gid)
+            if animation_frames and obj.properties['button'] == 0:
+                obj.gid = animation_frames[1]
+                obj.properties['button'] = 1
+        audio.play("interaction_click")
+        self.interactives.publish("buttons_on")
 
     def turn_off_button(self, player_rect):
         # Turn off button which ist close enough to player
-        elapsed_time = (time.time() - time.time()) * 1000
-        for layer in self.tmx_data.layers:
-            if isinstance(layer, pytmx.TiledObjectGroup) and layer.name == "Structures":
-                for obj in layer:
-                    if hasattr(obj, 'properties') and 'button' in obj.properties:
-                        obj_rect = pygame.Rect(obj.x, obj.y, obj.width, obj.height)
-                        if player_rect.colliderect(obj_rect.inflate(10, 10)):
-                            if obj.properties['button']:
-                                current_gid = self.get_animated_gid(self.tmx_data, obj.gid, elapsed_time)
-                                tile_properties = self.tmx_data.get_tile_properties_by_gid(current_gid)
-                                if tile_properties and 'frames' in tile_properties:
-                                    animation_frames = tile_properties['frames']
-                                    obj.gid = animation_frames[1][0]  # Vypnutý stav
-                                    obj.properties['button'] = 0
-                                    self.btn_off_count += 1
-                                    self.update_control_panel_animation()
-                                    self.interaction_click_sound.play()
-                                    if self.btn_off_count >= 3:
-                                        self.portal_open_sound.play()
-                                        pygame.mixer.music.load("Assets/Sounds/Music/background_music.mp3")
-                                        pygame.mixer.music.set_volume(0.1)
-                                        pygame.mixer.music.play(-1)
-                                        self.activate_teleport(self.tmx_data)
-                                        self.btn_off_count = 0
-                                        self.controllPanelOn = False
-                                        self.start_timer = None  # Reset časovačas
-                                        self.despawn_npcs = True
-                                        self.stopTimer = True
+        for button in self.interactives.get_near(player_rect, Button):
+            obj = button.obj
+            if obj.properties['button']:
+                current_gid = self.animation_index.get_frame_gid(obj.gid, 0)
+                animation_frames = self.animation_index.get_frames(current_gid)
+                if animation_frames:
+                    obj.gid = animation_frames[1]  # Vypnutý stav
+                    obj.properties['button'] = 0
+                    self.btn_off_count += 1
+                    self.update_control_panel_animation()
+                    audio.play("interaction_click")
+                    self.interactives.publish("button_off", count=self.btn_off_count)
+                    if self.btn_off_count >= 3:
+                        audio.play("portal_open")
+                        audio.play_music("background")
+                        target_maps = self.activate_teleport(self.tmx_data)
+                        self.btn_off_count = 0
+                        self.controllPanelOn = False
+                        self.start_timer = None  # Reset časovačas
+                        self.interactives.publish("portal_opened", target_maps=target_maps)
 
     def update_control_panel_animation(self):
         # Change control panel animation based on how many buttons are pressed
-        for layer in self.tmx_data.layers:
-            if isinstance(layer, pytmx.TiledObjectGroup) and layer.name == "Structures":
-                for obj in layer:
-                    if hasattr(obj, 'properties') and 'controllPanel' in obj.properties and obj.properties['controllPanel'] < 3:
-                        tile_properties = self.tmx_data.get_tile_properties_by_gid(obj.gid)
-                        if tile_properties and 'frames' in tile_properties:
-                            animation_frames = tile_properties['frames']
-                            next_frame_gid = animation_frames[1][0]
-                            obj.properties['controllPanel'] += 1
-                            obj.gid = next_frame_gid
+        for control_panel in self.interactives.control_panels:
+            obj = control_panel.obj
+            if obj.properties['controllPanel'] < 3:
+                animation_frames = self.animation_index.get_frames(obj.gid)
+                if animation_frames:
+                    obj.properties['controllPanel'] += 1
+                    obj.gid = animation_frames[1]
 
     def is_near_control_panel(self, player_rect):
-        # Check if the player is near an object with 'controllPanel = 1' in the 'Structures' layer
-        for layer in self.tmx_data.layers:
-            if isinstance(layer, pytmx.TiledObjectGroup):
-                if layer.name == "Structures":
-                    for obj in layer:
-                        if hasattr(obj, 'properties') and 'controllPanel' in obj.properties and obj.properties['controllPanel'] == 0:
-                            obj_rect = pygame.Rect(obj.x, obj.y, obj.width, obj.height)
-                            if player_rect.colliderect(obj_rect.inflate(10, 10)):  # Adjust the inflate value as needed
-                                return True
+        # Check if the player is near a control panel which was not turned on yet
+        for control_panel in self.interactives.get_near(player_rect, ControlPanel):
+            if control_panel.obj.properties['controllPanel'] == 0:
+                return True
         return False
 
     def is_near_button(self, player_rect):
         """Check if the player is near a button in the 'Structures' layer."""
-        for layer in self.tmx_data.layers:
-            if isinstance(layer, pytmx.TiledObjectGroup):
-                if layer.name == "Structures":
-                    for obj in layer:
-                        if hasattr(obj, 'properties') and 'button' in obj.properties:
-                            obj_rect = pygame.Rect(obj.x, obj.y, obj.width, obj.height)
-                            if player_rect.colliderect(obj_rect.inflate(10, 10)):  # Adjust the inflate value as needed
-                                return True
-        return False
+        return len(self.interactives.get_near(player_rect, Button)) > 0
 
     def reset_control_panel(self, player):
         # Reset the control panel and buttons after the time limit
         if self.controll_panel_on and self.start_timer is not None:
-            elapsed_time = time.time() - self.start_timer
+            elapsed_time = game_clock.time() - self.start_timer
             if elapsed_time > self.time_limit or player.is_dead:
-                for layer in self.tmx_data.layers:
-                    if isinstance(layer, pytmx.TiledObjectGroup) and layer.name == "Structures":
-                        for obj in layer:
-                            if hasattr(obj, 'properties'):
-                                if 'button' in obj.properties and obj.properties['button'] == 1:
-                                    obj.properties['button'] = 0  # Reset tlačidiel
-                                    tile_properties = self.tmx_data.get_tile_properties_by_gid(obj.gid)
-                                    if tile_properties and 'frames' in tile_properties:
-                                        animation_frames = tile_properties['frames']
-                                        obj.gid = animation_frames[1][0]  # Prepnúť späť na vypnutý stav
-                                if 'controllPanel' in obj.properties:
-                                    tile_properties = self.tmx_data.get_tile_properties_by_gid(obj.gid)
-                                    if tile_properties and 'frames' in tile_properties:
-                                        animation_frames = tile_properties['frames']
-                                        obj.gid = animation_frames[2][0]  # Prepnúť späť na pôvodný stav
-                                        obj.properties['controllPanel'] = 0
+                for button in self.interactives.buttons:
+                    obj = button.obj
+                    if obj.properties['button'] == 1:
+                        obj.properties['button'] = 0  # Reset tlačidiel
+                        animation_frames = self.animation_index.get_frames(obj.gid)
+                        if animation_frames:
+                            obj.gid = animation_frames[1]  # Prepnúť späť na vypnutý stav
+                for control_panel in self.interactives.control_panels:
+                    obj = control_panel.obj
+                    animation_frames = self.animation_index.get_frames(obj.gid)
+                    if animation_frames:
+                        obj.gid = animation_frames[2]  # Prepnúť späť na pôvodný stav
+                        obj.properties['controllPanel'] = 0
                 self.btn_off_count = 0
                 self.controll_panel_on = False
                 self.start_timer = None
-                pygame.mixer.music.load("Assets/Sounds/Music/background_music.mp3")
-                pygame.mixer.music.play(-1)
-                pygame.mixer.music.set_volume(0.1)
-                self.interaction_click_sound.play()
+                audio.play_music("background")
+                audio.play("interaction_click")
+                self.interactives.publish("control_panel_reset")
 
     def activate_teleport(self, tmx_data):
         # Activate the teleporter after all button are pressed before time limit
-        for layer in tmx_data.visible_layers:
-            if isinstance(layer, pytmx.TiledTileLayer):
-                for x, y, gid in layer:
-                    if gid != 0:
-                        tile_properties = tmx_data.get_tile_properties_by_gid(gid)
-                        if tile_properties and 'frames' in tile_properties and 'teleport' in tile_properties:
-                            animation_frames = tile_properties['frames']
-                            if len(animation_frames) > 1:
-                                new_gid = animation_frames[1][0]  # Použite správny index na získanie GID
-                                layer.data[y][x] = new_gid  # Aktualizujte iba potrebné GID
-                                tile_properties['teleport'] = 1
\ No newline at end of file
+        # Returns maps the activated teleports lead to
+        target_maps = []
+        for teleport in self.interactives.teleports:
+            if teleport.layer.data[teleport.y][teleport.x] == teleport.gid:
+                tile_properties = tmx_data.get_tile_properties_by_gid(teleport.gid)
+                animation_frames = self.animation_index.get_frames(teleport.gid)
+                if len(animation_frames) > 1:
+                    new_gid = animation_frames[1]  # Použite správny index na získanie GID
+                    self.set_tile_gid(teleport.layer, teleport.x, teleport.y, new_gid)  # Aktualizujte iba potrebné GID
+                    tile_properties['teleport'] = 1
+                    # Target map is a property of the active frame only
+                    target_maps.append(tmx_data.get_tile_properties_by_gid(new_gid).get('map'))
+        return target_maps
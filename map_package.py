@@ -0,0 +1,247 @@
+# Compiled maps: python map_package.py [map.tmx ...] compiles all maps under Assets/Maps without arguments
+# A package holds the parsed map objects, gid arrays of tile layers and flag grids of one TMX file,
+# loading it skips XML parsing and scanning of the layers. Missing or stale packages fall back to pytmx.
+import copyreg
+import glob
+import io
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import threading
+import numpy as np
+import pygame
+import pytmx
+from pytmx.util_pygame import handle_transformation, smart_convert
+from pixel_cache import load_scaled_image
+from source_files import describe_source, is_source_fresh
+from tile_flags import TileFlagsGrid, get_tile_flags, set_tile_flags
+
+PACKAGE_EXTENSION = ".tmxc"
+PACKAGE_VERSION = 1
+MAGIC = b"TMXC"
+HEADER = struct.Struct("<4sII")  # Magic, package version, length of the JSON metadata
+ALIGNMENT = 8
+PYTMX_VERSION = ".".join(map(str, pytmx.__version__))  # Pickled map objects depend on the pytmx version
+# Only these can be created while unpickling, a package is a map and not a program
+UNPICKLE_GLOBALS = {
+    ("pytmx.pytmx", name) for name in ("TiledMap", "TiledTileset", "TiledTileLayer", "TiledObjectGroup", "TiledObject",
+                                       "TiledImageLayer", "TiledGroupLayer", "TiledProperty", "TileFlags", "AnimationFrame")
+} | {("builtins", "list"), ("collections", "defaultdict"), ("map_package", "restore_element_state")}
+# Errors of a truncated or otherwise broken package
+PACKAGE_ERRORS = (ValueError, KeyError, IndexError, EOFError, pickle.UnpicklingError, AttributeError, TypeError)
+
+
+def get_package_path(tmx_path):
+    return os.path.splitext(tmx_path)[0] + PACKAGE_EXTENSION
+
+
+class TileImageLoader:
+    # pytmx image loader decoding tilesets through the pixel cache, remembers how every tile image was made
+    def __init__(self):
+        self.sources = {}  # Path -> decoded tileset image
+        self.records = {}  # id of a tile image -> (path, colorkey, rect, flags)
+
+    def __call__(self, filename, colorkey, **kwargs):
+        def load_image(rect=None, flags=None):
+            image = self.load_tile(filename, colorkey, rect, flags)
+            self.records[id(image)] = (filename, colorkey, rect, flags)
+            return image
+        return load_image
+
+    def release_sources(self):
+        # Tiles are converted copies, tilesets are not needed once the map is loaded
+        self.sources.clear()
+        self.records.clear()
+
+    def load_tile(self, filename, colorkey, rect, flags):
+        # Same tile as pytmx.util_pygame.pygame_image_loader makes
+        if filename not in self.sources:
+            self.sources[filename] = load_scaled_image(filename)
+        source = self.sources[filename]
+        tile = source.subsurface(rect) if rect else source.copy()
+        if flags:
+            tile = handle_transformation(tile, flags)
+        return smart_convert(tile, pygame.Color(f"#{colorkey}") if colorkey else None, True)
+
+
+class LayerArray:
+    # Stands for the data of a tile layer while the map is pickled
+    def __init__(self, name):
+        self.name = name
+
+
+def restore_element_state(element, state):
+    # pytmx elements look up missing attributes in their properties, so pickle can not ask them for __setstate__
+    element.__dict__.update(state)
+
+
+class PackagePickler(pickle.Pickler):
+    # Tile images, the image loader and gid arrays are stored outside of the pickled object tree
+    def __init__(self, file, image_loader):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.image_loader = image_loader
+        self.images = []
+
+    def persistent_id(self, obj):
+        if obj is self.image_loader:
+            return ("loader",)
+        if isinstance(obj, LayerArray):
+            return ("array", obj.name)
+        if isinstance(obj, pygame.Surface):
+            filename, colorkey, rect, flags = self.image_loader.records[id(obj)]
+            self.images.append([filename, colorkey, rect and list(rect), flags and list(flags)])
+            return ("image", len(self.images) - 1)
+        return None
+
+    def reducer_override(self, obj):
+        if isinstance(obj, pytmx.TiledElement):
+            # Object groups are lists of their objects
+            items = iter(obj) if isinstance(obj, list) else None
+            return copyreg.__newobj__, (type(obj),), obj.__dict__, items, None, restore_element_state
+        return NotImplemented
+
+
+class PackageUnpickler(pickle.Unpickler):
+    def __init__(self, file, image_loader, images, arrays):
+        super().__init__(file)
+        self.image_loader = image_loader
+        self.images = images
+        self.arrays = arrays
+
+    def find_class(self, module, name):
+        # Exact names only, a dotted name would reach through the imports of an allowed module
+        if "." not in name and (module, name) in UNPICKLE_GLOBALS:
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"Package may not contain {module}.{name}")
+
+    def persistent_load(self, pid):
+        if pid[0] == "loader":
+            return self.image_loader
+        if pid[0] == "array":
+            return self.arrays[pid[1]].tolist()  # Tiles are changed in game, layers stay plain lists
+        if pid[0] == "image":
+            filename, colorkey, rect, flags = self.images[pid[1]]
+            return self.image_loader.load_tile(filename, colorkey, rect and tuple(rect), flags and pytmx.TileFlags(*flags))
+        raise pickle.UnpicklingError(f"Unknown persistent id {pid}")
+
+
+def write_package(tmx_data, image_loader, package_path):
+    tile_layers = [layer for layer in tmx_data.layers if isinstance(layer, pytmx.TiledTileLayer)]
+    arrays = {f"layer_{index}": np.array(layer.data, dtype=np.uint32) for index, layer in enumerate(tile_layers)}
+    grid = get_tile_flags(tmx_data)
+    arrays["flags"], arrays["map_ids"] = grid.flags, grid.map_ids
+
+    # Layer data is swapped for placeholders only while pickling
+    layer_data = [layer.data for layer in tile_layers]
+    for index, layer in enumerate(tile_layers):
+        layer.data = LayerArray(f"layer_{index}")
+    tree = io.BytesIO()
+    pickler = PackagePickler(tree, image_loader)
+    try:
+        pickler.dump(tmx_data)
+    finally:
+        for layer, data in zip(tile_layers, layer_data):
+            layer.data = data
+
+    sections, offset = [], 0
+    metadata = {"pytmx": PYTMX_VERSION, "arrays": {}, "images": pickler.images,
+                "map_names": grid.map_names, "spawn_position": grid.spawn_position}
+    for name, array in arrays.items():
+        metadata["arrays"][name] = {"dtype": array.dtype.str, "shape": array.shape, "offset": offset}
+        sections.append(array.tobytes())
+        offset += -(-len(sections[-1]) // ALIGNMENT) * ALIGNMENT
+    metadata["tree"] = {"offset": offset, "length": len(tree.getvalue())}
+    sections.append(tree.getvalue())
+    metadata["sources"] = [describe_source(path) for path in [tmx_data.filename, *sorted({image[0] for image in pickler.images})]]
+
+    encoded = json.dumps(metadata).encode()
+    temporary_path = f"{package_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, PACKAGE_VERSION, len(encoded)))
+        file.write(encoded)
+        file.write(bytes(-file.tell() % ALIGNMENT))
+        for section in sections:
+            file.write(section)
+            file.write(bytes(-len(section) % ALIGNMENT))
+    os.replace(temporary_path, package_path)
+
+
+def compile_map(tmx_path, package_path=None):
+    # Parse the TMX file with pytmx and store it as a package next to it
+    image_loader = TileImageLoader()
+    tmx_data = pytmx.TiledMap(tmx_path, image_loader=image_loader)
+    try:
+        write_package(tmx_data, image_loader, package_path or get_package_path(tmx_path))
+    except (OSError, pickle.PicklingError):
+        pass  # Without a package the map is only parsed again next time
+    image_loader.release_sources()
+    return tmx_data
+
+
+def read_package(package_path):
+    # Map restored from the package, None when it is missing, broken or older than its sources
+    try:
+        with open(package_path, "rb") as file:
+            package = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    with package:
+        try:
+            return unpack_map(package)
+        except PACKAGE_ERRORS:
+            return None
+
+
+def unpack_map(package):
+    # Map restored from the mapped package file, None when it does not match this game or its sources
+    if len(package) < HEADER.size:
+        return None
+    magic, version, metadata_length = HEADER.unpack_from(package)
+    if magic != MAGIC or version != PACKAGE_VERSION:
+        return None
+    metadata = json.loads(package[HEADER.size:HEADER.size + metadata_length])
+    if metadata["pytmx"] != PYTMX_VERSION or not all(is_source_fresh(source) for source in metadata["sources"]):
+        return None
+
+    data_start = HEADER.size + metadata_length
+    data_start += -data_start % ALIGNMENT
+    arrays = {}
+    for name, array in metadata["arrays"].items():
+        dtype = np.dtype(array["dtype"])
+        count = int(np.prod(array["shape"]))
+        # Copied out of the mapping, flag grids are updated when tiles change
+        arrays[name] = np.frombuffer(package, dtype, count, data_start + array["offset"]).reshape(array["shape"]).copy()
+
+    tree = metadata["tree"]
+    tree_start = data_start + tree["offset"]
+    image_loader = TileImageLoader()
+    unpickler = PackageUnpickler(io.BytesIO(package[tree_start:tree_start + tree["length"]]), image_loader, metadata["images"], arrays)
+    tmx_data = unpickler.load()
+    image_loader.release_sources()
+
+    spawn_position = metadata["spawn_position"] and tuple(metadata["spawn_position"])
+    set_tile_flags(tmx_data, TileFlagsGrid(tmx_data, arrays["flags"], arrays["map_ids"], metadata["map_names"], spawn_position))
+    return tmx_data
+
+
+def load_map(tmx_path):
+    # Map from its compiled package, parsed and compiled again when the package is missing or stale
+    tmx_data = read_package(get_package_path(tmx_path))
+    if tmx_data is None:
+        tmx_data = compile_map(tmx_path)
+    return tmx_data
+
+
+if __name__ == "__main__":
+    # Compiled through the imported module, pickled map objects must refer to map_package and not __main__
+    from map_package import compile_map, get_package_path
+    pygame.init()
+    pygame.display.set_mode((1, 1), pygame.HIDDEN)  # Tile images are converted to the display format
+    for tmx_path in sys.argv[1:] or sorted(glob.glob("Assets/Maps/*/Map/*.tmx")):
+        compile_map(tmx_path)
+        print(f"Compiled {tmx_path} to {get_package_path(tmx_path)}")
+    pygame.quit()
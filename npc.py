@@ -1,31 +1,43 @@
 import math
 import os
+import numpy as np
 import pygame
 import random
-import pytmx
-import time
-from utils import get_tile_under_player, get_walk_tile_properties
-from animation_loader import load_animations
+from utils import get_tile_under_player, is_tile_walkable
+from asset_cache import load_animations, load_flipped_animations, load_image, release
+from spawn_pool import SpawnPool
+from flow_field import FlowField
+from spatial_hash import SpatialHash
+from crowd import get_separation_offsets
+from text_cache import render_text
+from game_clock import game_clock, interpolate
+
+NPC_GRID_CELL_SIZE = 128
+FLOATING_TEXT_FONT = ("Arial", 16, True)
+SPAWN_TRIES = 8  # Spawn positions tried before giving up until the next update
 
 
 class NPC(pygame.sprite.Sprite):
-    def __init__(self, floating_text_group, tmx_data, width, height, asset_path, start_x, start_y, attack_cooldown, max_approach_distance, max_detection_distance, hp, damage):
+    def __init__(self, floating_text_group, tmx_data, width, height, asset_path, start_x, start_y, attack_cooldown, max_approach_distance, max_detection_distance, hp, damage, heart_group):
         super().__init__()
         self.frame_count = 0
         self.asset_path = asset_path
         self.width = width
         self.height = height
         self.rect = pygame.Rect(start_x, start_y, width, height)
+        self.previous_position = self.rect.topleft  # Position before the last simulation step
         self.floating_text_group = floating_text_group
+        self.heart_group = heart_group  # Hearts dropped on the level of the NPC
         self.camera_x = 0
         self.camera_y = 0
 
         # Animation setup
         self.animations = load_animations(asset_path, width, height)
+        self.flipped_animations = load_flipped_animations(asset_path, width, height)  # Frames facing left
         self.current_animation = "Idle"  # Default animation
 
-        self.heart_image = pygame.image.load("Assets/Items/heart.png")  # Obrázok srdca
-        self.heart_image = pygame.transform.scale(self.heart_image, (32, 32))
+        self.heart_image = load_image("Assets/Items/heart.png", (32, 32), alpha=True)  # Obrázok srdca
+        self.assets_released = False
 
         # Check if animation exists and is valid
         if self.current_animation in self.animations and len(self.animations[self.current_animation]) > 0:
@@ -33,7 +45,7 @@ class NPC(pygame.sprite.Sprite):
 
         self.animation_index = 0
         self.animation_speed = 0.1  # Frames per update
-        self.last_frame_time = pygame.time.get_ticks()
+        self.last_frame_time = game_clock.get_ticks()
 
         # Other attributes
         self.speed = 2.5
@@ -41,7 +53,7 @@ class NPC(pygame.sprite.Sprite):
         self.health = hp
         self.damage = damage
         self.attack_cooldown = attack_cooldown
-        self.last_attack_time = 0
+        self.last_attack_time = -attack_cooldown  # Game time starts at 0, the first attack is not delayed
         self.max_approach_distance = max_approach_distance
         self.max_detection_distance = max_detection_distance
         self.tmx_data = tmx_data
@@ -65,7 +77,7 @@ class NPC(pygame.sprite.Sprite):
         return animations
 
     def apply_effect(self, effect_name, duration):
-        current_time = pygame.time.get_ticks()
+        current_time = game_clock.get_ticks()
 
         if effect_name == "slow" and "slow" not in self.effects:
             self.effects["slow"] = current_time + duration
@@ -86,15 +98,16 @@ class NPC(pygame.sprite.Sprite):
 
         self.knockback_target_pos = pygame.Vector2(target_x, target_y)
 
-    def update(self, player, tmx_data, camera_x, camera_y):
-        # Update NPC position and behavior each frame
+    def update(self, player, tmx_data, camera_x, camera_y, flow_field=None):
+        # Update NPC position and behavior each simulation step
+        self.previous_position = self.rect.topleft
         self.frame_count += 1
         self.camera_x = camera_x
         self.camera_y = camera_y
 
         # Pohyb iba každý druhý frame
         if self.frame_count % 2 == 0:
-            current_time = pygame.time.get_ticks()
+            current_time = game_clock.get_ticks()
 
             if "overheat" in self.effects:
                 overheat_data = self.effects["overheat"]
@@ -114,7 +127,7 @@ class NPC(pygame.sprite.Sprite):
             distance_to_player = self.get_distance_to_player(player)
 
             # Update animation
-            current_time = pygame.time.get_ticks()
+            current_time = game_clock.get_ticks()
             if current_time - self.last_frame_time > (1000 * self.animation_speed):
                 self.animation_index = (self.animation_index + 1) % len(self.animations[self.current_animation])
                 self.image = self.animations[self.current_animation][self.animation_index]
@@ -130,8 +143,7 @@ class NPC(pygame.sprite.Sprite):
 
                     # Verify final position is walkable
                     tile_x, tile_y = get_tile_under_player(self.rect, self.tmx_data)
-                    tile_properties = get_walk_tile_properties(tile_x, tile_y, self.tmx_data)
-                    if not (tile_properties and tile_properties.get("canWalk") == 1):
+                    if not is_tile_walkable(tile_x, tile_y, self.tmx_data):
                         self.knockback_target_pos = None  # Reset knockback if not valid
                     else:
                         self.knockback_target_pos = None  # End knockback
@@ -144,9 +156,8 @@ class NPC(pygame.sprite.Sprite):
                     # Check if the intermediate position is walkable
                     next_rect = pygame.Rect(next_x, next_y, self.rect.width, self.rect.height)
                     tile_x, tile_y = get_tile_under_player(next_rect, self.tmx_data)
-                    tile_properties = get_walk_tile_properties(tile_x, tile_y, self.tmx_data)
 
-                    if tile_properties and tile_properties.get("canWalk") == 1:
+                    if is_tile_walkable(tile_x, tile_y, self.tmx_data):
                         self.rect.x += direction.x
                         self.rect.y += direction.y
                     else:
@@ -154,7 +165,7 @@ class NPC(pygame.sprite.Sprite):
 
             if distance_to_player <= self.max_detection_distance:
                 if distance_to_player > self.max_approach_distance:
-                    direction = self.get_direction_toward_player(player)
+                    direction = self.get_direction_toward_player(player, flow_field)
                     self.update_orientation(player)
                     if self.can_move_to(direction, tmx_data):
                         self.move_toward_player(direction)
@@ -187,11 +198,20 @@ class NPC(pygame.sprite.Sprite):
                 self.animation_index = 0
 
             if self.facing_direction == "left":
-                self.image = pygame.transform.flip(self.animations[self.current_animation][self.animation_index], True,False)
+                self.image = self.flipped_animations[self.current_animation][self.animation_index]
             else:
                 self.image = self.animations[self.current_animation][self.animation_index]
 
-    def get_direction_toward_player(self, player):
+    def get_direction_toward_player(self, player, flow_field=None):
+        if flow_field:
+            # Follow the shared flow field around non-walkable tiles until the next tile is the player's
+            tile_x, tile_y = get_tile_under_player(self.rect, self.tmx_data)
+            next_tile = flow_field.get_next_tile(tile_x, tile_y)
+            if next_tile and flow_field.get_distance(*next_tile) > 0:
+                target_x = (next_tile[0] + 0.5) * self.tmx_data.tilewidth
+                target_y = (next_tile[1] + 0.5) * self.tmx_data.tileheight
+                return math.atan2(target_y - self.rect.centery, target_x - self.rect.centerx)
+
         dx = player.rect.centerx - self.rect.centerx
         dy = player.rect.centery - self.rect.centery
         angle = math.atan2(dy, dx)
@@ -205,10 +225,7 @@ class NPC(pygame.sprite.Sprite):
         # Get the tile under the potential new position
         tile_x, tile_y = get_tile_under_player(pygame.Rect(next_x, next_y, self.rect.width, self.rect.height), tmx_data)
 
-        # Get the properties of the tile
-        tile_properties = get_walk_tile_properties(tile_x, tile_y, tmx_data)
-
-        return tile_properties and tile_properties.get("canWalk") == 1
+        return is_tile_walkable(tile_x, tile_y, tmx_data)
 
     def move_toward_player(self, direction):
         if self.current_animation != "Walk":
@@ -225,7 +242,7 @@ class NPC(pygame.sprite.Sprite):
         return pygame.math.Vector2(distance).length() < self.attack_range
 
     def attack(self, player):
-        current_time = time.time()
+        current_time = game_clock.time()
         self.current_animation = "Attack"
 
         # Update NPC orientation based on the player's position during the attack
@@ -235,6 +252,15 @@ class NPC(pygame.sprite.Sprite):
             player.take_damage(self.damage)
             self.last_attack_time = current_time  # Update last attack time
 
+    def kill(self):
+        # Return shared animations to the asset cache once the NPC is removed
+        if not self.assets_released:
+            release(self.animations)
+            release(self.flipped_animations)
+            release(self.heart_image)
+            self.assets_released = True
+        super().kill()
+
     def take_damage(self, damage, floating_text_group):
         # Reduce NPC health and create a floating text
         self.health -= damage
@@ -250,10 +276,11 @@ class NPC(pygame.sprite.Sprite):
     def drop_item(self):
         if random.randint(1, 15) == 1:  # Chance of drop heart
             heart = DroppedHeart(self.rect.centerx, self.rect.centery, self.heart_image)
-            DroppedHeart.all_hearts.add(heart)
+            self.heart_group.add(heart)
 
-    def draw(self, surface, camera):
-        surface.blit(self.image, self.rect.move(-camera.x, -camera.y))
+    def draw(self, surface, camera, alpha=1.0):
+        x, y = interpolate(self.previous_position, self.rect.topleft, alpha)
+        return surface.blit(self.image, (x - camera.x, y - camera.y))
 
 class NPCManager:
     def __init__(self, floating_text_group, tmx_data, spawn_interval, max_enemies, min_distance, npc_assets, size, hp, damage):
@@ -261,82 +288,137 @@ class NPCManager:
         self.tmx_data = tmx_data
         self.spawn_interval = spawn_interval
         self.max_enemies = max_enemies  # Maximum number of NPCs allowed
-        self.last_spawn_time = time.time()
+        self.last_spawn_time = game_clock.time()
+        self.failed_spawns = 0  # Spawns which found no free position, each is retried on the next update
         self.min_distance = min_distance  # Minimum distance between NPCs
         self.floating_text_group = floating_text_group
         self.npc_assets = npc_assets
         self.size = size
         self.hp = hp
         self.damage = damage
-
-    def check_minimum_distance(self, npc, other_npcs):
-        # Ensure the NPC is at least minimum distance away from all other NPCs
-        for other_npc in other_npcs:
-            if other_npc != npc:
-                distance = pygame.math.Vector2(
-                    npc.rect.centerx - other_npc.rect.centerx,
-                    npc.rect.centery - other_npc.rect.centery
-                ).length()
-                if distance < self.min_distance:
-                    return False
+        self.spawn_pool = SpawnPool(tmx_data)  # Walkable positions built once per map
+        self.flow_field = FlowField(tmx_data)  # Shared path to the player for all NPCs
+        self.grid = SpatialHash(NPC_GRID_CELL_SIZE)  # NPC rects for contact queries of abilities
+        self.grid_entries = {}  # NPC -> its entry in the grid
+        self.hearts = pygame.sprite.Group()  # Hearts dropped on this level
+
+        # Keep NPC assets cached for the whole level, even while no NPC is alive
+        self.animations = load_animations(npc_assets, size, size)
+        self.flipped_animations = load_flipped_animations(npc_assets, size, size)
+        self.heart_image = load_image("Assets/Items/heart.png", (32, 32), alpha=True)
+
+    def check_minimum_distance(self, center):
+        # Ensure a position is at least minimum distance away from all other NPCs
+        for npc in self.get_npcs_in_radius(center, self.min_distance):
+            if math.dist(center, npc.rect.center) < self.min_distance:
+                return False
+        return True
 
     def get_random_walkable_position(self):
         # Get a random walkable position on the map
-        walkable_positions = []
-        for layer in self.tmx_data.visible_layers:
-            if isinstance(layer, pytmx.TiledTileLayer):
-                for x, y, gid in layer:
-                    if gid != 0:  # Ensure the tile is not empty
-                        tile_properties = get_walk_tile_properties(x, y, self.tmx_data)
-                        if tile_properties and tile_properties.get("canWalk") == 1:
-                            walkable_positions.append((x * self.tmx_data.tilewidth, y * self.tmx_data.tileheight))
-
-        if walkable_positions:
-            return random.choice(walkable_positions)
-        return None
+        return self.spawn_pool.sample()
 
     def update(self, player, camera_x, camera_y):
-        current_time = time.time()
+        current_time = game_clock.time()
         if current_time - self.last_spawn_time >= self.spawn_interval:
-            if len(self.npcs) < self.max_enemies:  # Only spawn if current number of NPCs is less than max
-                self.spawn_npc(player)
-            self.last_spawn_time = current_time
+            # Only spawn if current number of NPCs is less than max, a failed spawn keeps the interval elapsed
+            if len(self.npcs) >= self.max_enemies or self.spawn_npc(player):
+                self.last_spawn_time = current_time
 
-        for npc in self.npcs:
-            npc.update(player, self.tmx_data, camera_x, camera_y)
+        if self.npcs:
+            self.flow_field.update(*get_tile_under_player(player.rect, self.tmx_data))
 
-        DroppedHeart.all_hearts.update(player)
+        for npc in self.npcs:
+            npc.update(player, self.tmx_data, camera_x, camera_y, self.flow_field)
+            self.update_grid(npc)
+        self.separate_npcs()
+        for npc in [npc for npc in self.grid_entries if not npc.alive()]:
+            self.update_grid(npc)
+
+        self.hearts.update(player)
+
+    def separate_npcs(self):
+        # Push NPCs closer than min_distance apart, but never onto a non-walkable tile
+        npcs = self.npcs.sprites()
+        offsets_x, offsets_y = get_separation_offsets([npc.rect.centerx for npc in npcs], [npc.rect.centery for npc in npcs], self.min_distance)
+        for npc, offset_x, offset_y in zip(npcs, np.rint(offsets_x), np.rint(offsets_y)):
+            if offset_x or offset_y:
+                next_rect = npc.rect.move(int(offset_x), int(offset_y))
+                if is_tile_walkable(*get_tile_under_player(next_rect, self.tmx_data), self.tmx_data):
+                    npc.rect.topleft = next_rect.topleft
+                    self.update_grid(npc)
+
+    def update_grid(self, npc):
+        # Move the NPC to the cells of its rect whenever the rect changes, killed NPCs are taken out
+        # NPCs are inserted when spawned, so queries return them in group order
+        entry = self.grid_entries.get(npc)
+        if not npc.alive():
+            if entry is not None:
+                self.grid.remove(self.grid_entries.pop(npc))
+        elif entry is None:
+            self.grid_entries[npc] = self.grid.insert(npc, npc.rect)
+        else:
+            self.grid.move(entry, npc.rect)
+
+    def get_npcs_in_rect(self, rect):
+        # Living NPCs colliding with the rect, in group order
+        return [npc for npc in self.grid.query(rect) if npc.alive() and npc.rect.colliderect(rect)]
+
+    def get_npcs_in_radius(self, center, radius):
+        # Living NPCs whose center is at most radius away from the given center
+        query_rect = pygame.Rect(center[0] - radius, center[1] - radius, radius * 2 + 1, radius * 2 + 1)
+        return [npc for npc in self.get_npcs_in_rect(query_rect) if math.dist(center, npc.rect.center) <= radius]
+
+    def get_spawn_position(self, player, min_player_distance):
+        # Walkable position far enough from the player and not on top of another NPC
+        for _ in range(SPAWN_TRIES):
+            spawn_pos = self.spawn_pool.sample_far_from(player.rect.centerx, player.rect.centery, min_player_distance)
+            if spawn_pos is None:
+                return None
+            if self.check_minimum_distance((spawn_pos[0] + self.size // 2, spawn_pos[1] + self.size // 2)):
+                return spawn_pos
+        return None
 
     def spawn_npc(self, player):
-        """Spawn a new NPC at a random walkable position far from the player."""
-        spawn_pos = self.get_random_walkable_position()
+        """Spawn a new NPC at a random walkable position far from the player, returns False if there was no free position."""
         max_aproach_distance = 40
         max_detection_distance = 300
-        if spawn_pos:
-            # Check if the spawn position is far enough from the player
-            distance_to_player = pygame.math.Vector2(
-                spawn_pos[0] - player.rect.centerx,
-                spawn_pos[1] - player.rect.centery
-            ).length()
-
-            if distance_to_player > max_detection_distance + 100:
-                npc = NPC(self.floating_text_group, self.tmx_data, self.size, self.size, self.npc_assets, spawn_pos[0], spawn_pos[1], 1,  max_aproach_distance, max_detection_distance, self.hp, self.damage)
-                self.npcs.add(npc)
+        spawn_pos = self.get_spawn_position(player, max_detection_distance + 100)
+        if not spawn_pos:
+            self.failed_spawns += 1
+            return False
+        npc = NPC(self.floating_text_group, self.tmx_data, self.size, self.size, self.npc_assets, spawn_pos[0], spawn_pos[1], 1,  max_aproach_distance, max_detection_distance, self.hp, self.damage, self.hearts)
+        self.npcs.add(npc)
+        self.update_grid(npc)
+        return True
 
     def despawn_all_npcs(self):
-        self.npcs.empty()
-
-    def draw(self, surface, camera):
         for npc in self.npcs:
-            npc.draw(surface, camera)
+            npc.kill()
+        self.grid.clear()
+        self.grid_entries.clear()
+
+    def release_assets(self):
+        # Free NPC assets and hearts of the level when it is released
+        self.despawn_all_npcs()
+        self.hearts.empty()
+        release(self.animations)
+        release(self.flipped_animations)
+        release(self.heart_image)
+
+    def draw(self, surface, camera, alpha=1.0):
+        # Returns screen rects of drawn NPCs and hearts, NPCs are drawn between their last two positions
+        drawn_rects = []
+        for npc in self.npcs:
+            drawn_rects.append(npc.draw(surface, camera, alpha))
 
-        for heart in DroppedHeart.all_hearts:
-            surface.blit(heart.image, heart.rect.move(-camera.x, -camera.y))
+        for heart in self.hearts:
+            drawn_rects.append(surface.blit(heart.image, heart.rect.move(-camera.x, -camera.y)))
+        return drawn_rects
 
 class FloatingText(pygame.sprite.Sprite):
     def __init__(self, text, x, y, duration=1, color=(255, 0, 0), outline_color=(0, 0, 0), rise_speed=30):
         super().__init__()
-        self.font = pygame.font.SysFont("Arial", 16, bold=True)
         self.text = text
         self.color = color
         self.outline_color = outline_color
@@ -345,24 +427,17 @@ class FloatingText(pygame.sprite.Sprite):
         self.logical_x = x
         self.logical_y = y
         self.start_y = y
-        self.spawn_time = time.time()
+        self.spawn_time = game_clock.time()
         self.duration = duration
         self.rise_speed = rise_speed
 
     def create_text_image(self):
-        # Create text
-        text_surface = self.font.render(self.text, True, self.color)
-        outline_surface = self.font.render(self.text, True, self.outline_color)
-        outlined_image = pygame.Surface((text_surface.get_width() + 2, text_surface.get_height() + 2), pygame.SRCALPHA)
-        positions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-        for pos in positions:
-            outlined_image.blit(outline_surface, (1 + pos[0], 1 + pos[1]))
-        outlined_image.blit(text_surface, (1, 1))
-        return outlined_image
+        # Outlined text, shared with other floating texts showing the same number
+        return render_text(self.text, FLOATING_TEXT_FONT, self.color, self.outline_color)
 
     def update(self, camera_x, camera_y):
         # Update the position, make the text rise, and check expiration
-        time_elapsed = time.time() - self.spawn_time
+        time_elapsed = game_clock.time() - self.spawn_time
         self.logical_y = self.start_y - int(time_elapsed * self.rise_speed)
         self.rect.center = (self.logical_x - camera_x, self.logical_y - camera_y)
 
@@ -370,16 +445,14 @@ class FloatingText(pygame.sprite.Sprite):
             self.kill()
 
     def draw(self, surface):
-        surface.blit(self.image, self.rect)
+        return surface.blit(self.image, self.rect)
 
 class DroppedHeart(pygame.sprite.Sprite):
-    all_hearts = pygame.sprite.Group()
-
     def __init__(self, x, y, image):
         super().__init__()
         self.image = image
         self.rect = self.image.get_rect(center=(x, y))
-        self.spawn_time = pygame.time.get_ticks()
+        self.spawn_time = game_clock.get_ticks()
 
     def update(self, player):
         # Check if player took a heart or time has passed
@@ -387,7 +460,7 @@ class DroppedHeart(pygame.sprite.Sprite):
             player.health = min(player.health + 25, player.max_health)
             self.kill()
 
-        if pygame.time.get_ticks() - self.spawn_time > 15000:
+        if game_clock.get_ticks() - self.spawn_time > 15000:
             self.kill()
 
 
@@ -0,0 +1,336 @@
+import math
+import random
+import numpy as np
+import pygame
+from npc import NPCManager, FloatingText, DroppedHeart
+from tile_flags import get_tile_flags
+from utils import get_tile_under_player
+from crowd import get_separation_offsets
+from game_clock import game_clock, interpolate
+
+# Animations by their index in the animation arrays
+ANIMATIONS = ("Idle", "Walk", "Attack")
+IDLE, WALK, ATTACK = range(len(ANIMATIONS))
+
+# Same values as NPC and NPCManager.spawn_npc use
+NPC_SPEED = 2.5
+ATTACK_RANGE = 40
+ATTACK_COOLDOWN = 1
+MAX_APPROACH_DISTANCE = 40
+MAX_DETECTION_DISTANCE = 300
+ANIMATION_DELAY = 100  # Milliseconds between animation frames
+KNOCKBACK_SPEED = 10
+OVERHEAT_DAMAGE = 5  # Damage every second while overheated
+
+# Per-NPC arrays, one entry for every NPC in spawn order
+FIELDS = (
+    ("x", np.int64), ("y", np.int64), ("previous_x", np.int64), ("previous_y", np.int64), ("speed", np.float64), ("health", np.float64),
+    ("frame_count", np.int64), ("anim", np.int64), ("anim_index", np.int64), ("last_frame_time", np.int64),
+    ("image_anim", np.int64), ("image_index", np.int64), ("image_flipped", np.bool_),
+    ("last_attack_time", np.float64),
+    ("slow_active", np.bool_), ("slow_end", np.int64),
+    ("overheat_active", np.bool_), ("overheat_end", np.int64), ("overheat_last", np.int64),
+    ("knockback_active", np.bool_), ("knockback_x", np.float64), ("knockback_y", np.float64),
+    ("dead", np.bool_),
+)
+
+
+class SwarmNPC:
+    # Handle of one NPC stored in SwarmNPCManager arrays, used by abilities like an NPC sprite
+    def __init__(self, manager, index):
+        self.manager = manager
+        self.index = index
+
+    @property
+    def rect(self):
+        return self.manager.get_rect(self.index)
+
+    def alive(self):
+        return self.index is not None and not self.manager.dead[self.index]
+
+    def take_damage(self, damage, floating_text_group):
+        self.manager.damage_npc(self.index, damage, floating_text_group)
+
+    def knockback(self, direction, distance):
+        self.manager.knockback_npc(self.index, direction, distance)
+
+    def apply_effect(self, effect_name, duration):
+        self.manager.apply_effect(self.index, effect_name, duration)
+
+
+class SwarmNPCManager(NPCManager):
+    def __init__(self, floating_text_group, tmx_data, spawn_interval, max_enemies, min_distance, npc_assets, size, hp, damage):
+        super().__init__(floating_text_group, tmx_data, spawn_interval, max_enemies, min_distance, npc_assets, size, hp, damage)
+        self.npcs = []  # Handles in the same order as the arrays
+        self.tile_flags = get_tile_flags(tmx_data)
+        self.half_size = size // 2
+
+        # Animations of the manager are shared by all NPCs, flipped frames are used when facing left
+        self.frames = [self.animations[name] for name in ANIMATIONS]
+        self.flipped_frames = [self.flipped_animations[name] for name in ANIMATIONS]
+        self.frame_counts = np.array([len(frames) for frames in self.frames], dtype=np.int64)
+
+        self.count = 0
+        self.capacity = 0
+        self.resize(64)
+
+    def resize(self, capacity):
+        for name, dtype in FIELDS:
+            array = np.zeros(capacity, dtype=dtype)
+            if self.capacity:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def add_npc(self, x, y):
+        if self.count == self.capacity:
+            self.resize(self.capacity * 2)
+        index = self.count
+        for name, dtype in FIELDS:
+            getattr(self, name)[index] = 0
+        self.x[index], self.y[index] = x, y
+        self.previous_x[index], self.previous_y[index] = x, y
+        self.speed[index] = NPC_SPEED
+        self.health[index] = self.hp
+        self.last_attack_time[index] = -ATTACK_COOLDOWN
+        self.anim[index] = self.image_anim[index] = IDLE
+        self.last_frame_time[index] = game_clock.get_ticks()
+        self.npcs.append(SwarmNPC(self, index))
+        self.count += 1
+
+    def remove_dead(self):
+        # Compact arrays after NPCs were killed, keeping the spawn order
+        alive = ~self.dead[:self.count]
+        if alive.all():
+            return
+        for name, dtype in FIELDS:
+            array = getattr(self, name)
+            kept = array[:self.count][alive]
+            array[:len(kept)] = kept
+
+        handles = []
+        for handle, is_alive in zip(self.npcs, alive):
+            if is_alive:
+                handle.index = len(handles)
+                handles.append(handle)
+            else:
+                handle.index = None
+        self.npcs = handles
+        self.count = len(handles)
+
+    def get_rect(self, index):
+        return pygame.Rect(int(self.x[index]), int(self.y[index]), self.size, self.size)
+
+    def damage_npc(self, index, damage, floating_text_group):
+        # Same as NPC.take_damage
+        self.health[index] -= damage
+        center_x, center_y = int(self.x[index]) + self.half_size, int(self.y[index]) + self.half_size
+        if self.health[index] <= 0:
+            self.health[index] = 0
+            if random.randint(1, 15) == 1:  # Chance of drop heart
+                self.hearts.add(DroppedHeart(center_x, center_y, self.heart_image))
+            self.dead[index] = True
+
+        floating_text_group.add(FloatingText(f"-{damage}", center_x, center_y, 0.5))
+
+    def knockback_npc(self, index, direction, distance):
+        self.knockback_x[index] = int(self.x[index]) + distance * math.cos(direction)
+        self.knockback_y[index] = int(self.y[index]) + distance * math.sin(direction)
+        self.knockback_active[index] = True
+
+    def apply_effect(self, index, effect_name, duration):
+        current_time = game_clock.get_ticks()
+        if effect_name == "slow" and not self.slow_active[index]:
+            self.slow_active[index] = True
+            self.slow_end[index] = current_time + duration
+            self.speed[index] /= 2
+        elif effect_name == "overheat" and not self.overheat_active[index]:
+            self.overheat_active[index] = True
+            self.overheat_end[index] = current_time + duration
+            self.overheat_last[index] = current_time
+
+    def update(self, player, camera_x, camera_y):
+        self.remove_dead()
+        self.previous_x[:self.count], self.previous_y[:self.count] = self.x[:self.count], self.y[:self.count]
+        current_time = game_clock.time()
+        if current_time - self.last_spawn_time >= self.spawn_interval:
+            if len(self.npcs) >= self.max_enemies or self.spawn_npc(player):
+                self.last_spawn_time = current_time
+
+        if self.npcs:
+            self.flow_field.update(*get_tile_under_player(player.rect, self.tmx_data))
+        self.simulate(player)
+        self.separate_npcs()
+
+        self.hearts.update(player)
+
+    def spawn_npc(self, player):
+        spawn_pos = self.get_spawn_position(player, MAX_DETECTION_DISTANCE + 100)
+        if not spawn_pos:
+            self.failed_spawns += 1
+            return False
+        self.add_npc(*spawn_pos)
+        return True
+
+    def simulate(self, player):
+        # Advance all NPCs by one simulation step, the same steps as NPC.update
+        n = self.count
+        if not n:
+            return
+        x, y, speed = self.x[:n], self.y[:n], self.speed[:n]
+        anim, anim_index = self.anim[:n], self.anim_index[:n]
+        player_x, player_y = player.rect.center
+        tile_width, tile_height = self.tmx_data.tilewidth, self.tmx_data.tileheight
+
+        # NPCs move only every second frame
+        self.frame_count[:n] += 1
+        moving = self.frame_count[:n] % 2 == 0
+        current_time = game_clock.get_ticks()
+
+        # Overheat damage every second, then expiry of effects
+        overheated = moving & self.overheat_active[:n]
+        burning = overheated & (current_time >= self.overheat_last[:n] + 1000)
+        for index in np.flatnonzero(burning):
+            self.damage_npc(index, OVERHEAT_DAMAGE, self.floating_text_group)
+        self.overheat_last[:n][burning] = current_time
+        self.overheat_active[:n][overheated & (current_time >= self.overheat_end[:n])] = False
+
+        slow_ended = moving & self.slow_active[:n] & (current_time > self.slow_end[:n])
+        self.slow_active[:n][slow_ended] = False
+        speed[slow_ended] *= 2
+
+        # Distance is measured before knockback moves the NPC
+        distance_sq = (x + self.half_size - player_x) ** 2 + (y + self.half_size - player_y) ** 2
+
+        animating = moving & (current_time - self.last_frame_time[:n] > ANIMATION_DELAY)
+        anim_index[animating] = (anim_index[animating] + 1) % self.frame_counts[anim[animating]]
+        self.image_anim[:n][animating] = anim[animating]
+        self.image_index[:n][animating] = anim_index[animating]
+        self.image_flipped[:n][animating] = False
+        self.last_frame_time[:n][animating] = current_time
+
+        # Knockback is rare, step it one NPC at a time
+        knocked = moving & self.knockback_active[:n] & ((self.knockback_x[:n] != 0) | (self.knockback_y[:n] != 0))
+        for index in np.flatnonzero(knocked):
+            self.step_knockback(index)
+
+        detected = moving & (distance_sq <= MAX_DETECTION_DISTANCE ** 2)
+        approaching = np.flatnonzero(detected & (distance_sq > MAX_APPROACH_DISTANCE ** 2))
+        going_idle = moving & ~detected & (anim != IDLE)
+        anim[going_idle] = IDLE
+        anim_index[going_idle] = 0
+
+        if len(approaching):
+            center_x, center_y = x[approaching] + self.half_size, y[approaching] + self.half_size
+            directions = self.get_directions_toward_player(center_x, center_y, player_x, player_y)
+            self.update_orientation(approaching, center_x, player_x)
+
+            # Move only when the tile under the next position is walkable
+            next_x = np.trunc(x[approaching] + speed[approaching] * np.cos(directions)).astype(np.int64)
+            next_y = np.trunc(y[approaching] + speed[approaching] * np.sin(directions)).astype(np.int64)
+            can_move = self.tile_flags.is_walkable_many((next_x + self.half_size) // tile_width, (next_y + self.half_size) // tile_height)
+            moved = approaching[can_move]
+            anim_index[moved[anim[moved] != WALK]] = 0
+            anim[moved] = WALK
+            x[moved], y[moved] = next_x[can_move], next_y[can_move]
+
+        center_x, center_y = x + self.half_size, y + self.half_size
+        attacking = np.flatnonzero(moving & ((center_x - player_x) ** 2 + (center_y - player_y) ** 2 < ATTACK_RANGE ** 2))
+        if len(attacking):
+            anim[attacking] = ATTACK
+            self.update_orientation(attacking, center_x[attacking], player_x)
+            attack_time = game_clock.time()
+            ready = attacking[attack_time - self.last_attack_time[attacking] >= ATTACK_COOLDOWN]
+            for _ in ready:
+                player.take_damage(self.damage)
+            self.last_attack_time[ready] = attack_time
+
+        self.frame_count[:n][self.frame_count[:n] >= 60] = 0
+
+    def separate_npcs(self):
+        # Same as NPCManager.separate_npcs for all living NPCs at once
+        living = np.flatnonzero(~self.dead[:self.count])
+        center_x, center_y = self.x[living] + self.half_size, self.y[living] + self.half_size
+        offsets_x, offsets_y = get_separation_offsets(center_x, center_y, self.min_distance)
+        offsets_x, offsets_y = np.rint(offsets_x).astype(np.int64), np.rint(offsets_y).astype(np.int64)
+        pushed = (offsets_x != 0) | (offsets_y != 0)
+        tile_x = (center_x + offsets_x) // self.tmx_data.tilewidth
+        tile_y = (center_y + offsets_y) // self.tmx_data.tileheight
+        moved = pushed & self.tile_flags.is_walkable_many(tile_x, tile_y)
+        self.x[living[moved]] += offsets_x[moved]
+        self.y[living[moved]] += offsets_y[moved]
+
+    def step_knockback(self, index):
+        # Same as the knockback part of NPC.update
+        target = pygame.Vector2(self.knockback_x[index], self.knockback_y[index])
+        direction = target - pygame.Vector2(int(self.x[index]), int(self.y[index]))
+        if direction.length() <= KNOCKBACK_SPEED:
+            self.x[index], self.y[index] = int(target.x), int(target.y)
+            self.knockback_active[index] = False
+        else:
+            direction = direction.normalize() * KNOCKBACK_SPEED
+            next_x, next_y = int(self.x[index] + direction.x), int(self.y[index] + direction.y)
+            tile_x, tile_y = get_tile_under_player(pygame.Rect(next_x, next_y, self.size, self.size), self.tmx_data)
+            if self.tile_flags.is_walkable(tile_x, tile_y):
+                self.x[index], self.y[index] = next_x, next_y
+            else:
+                self.knockback_active[index] = False
+
+    def get_directions_toward_player(self, center_x, center_y, player_x, player_y):
+        # Angles toward the player, or toward the next flow field tile like NPC.get_direction_toward_player
+        directions = np.arctan2(player_y - center_y, player_x - center_x)
+        field = self.flow_field
+        if field.target is None:
+            return directions
+
+        tile_x, tile_y = center_x // self.tmx_data.tilewidth, center_y // self.tmx_data.tileheight
+        inside = (tile_x >= 0) & (tile_x < field.width) & (tile_y >= 0) & (tile_y < field.height)
+        tile_x, tile_y = np.clip(tile_x, 0, field.width - 1), np.clip(tile_y, 0, field.height - 1)
+        next_x, next_y = field.next_x[tile_y, tile_x], field.next_y[tile_y, tile_x]
+        stuck = (next_x == tile_x) & (next_y == tile_y) & (field.distances[tile_y, tile_x] != 0)
+        following = inside & ~stuck & (field.distances[next_y, next_x] > 0)
+
+        target_x = (next_x + 0.5) * self.tmx_data.tilewidth
+        target_y = (next_y + 0.5) * self.tmx_data.tileheight
+        return np.where(following, np.arctan2(target_y - center_y, target_x - center_x), directions)
+
+    def update_orientation(self, indexes, center_x, player_x):
+        # Face the player and show the current animation frame, like NPC.update_orientation
+        anim, anim_index = self.anim[indexes], self.anim_index[indexes]
+        anim_index[anim_index >= self.frame_counts[anim]] = 0
+        self.anim_index[indexes] = anim_index
+        self.image_anim[indexes] = anim
+        self.image_index[indexes] = anim_index
+        self.image_flipped[indexes] = player_x < center_x
+
+    def get_npcs_in_rect(self, rect):
+        # Living NPCs colliding with the rect, in spawn order
+        rect = pygame.Rect(rect)
+        x, y = self.x[:self.count], self.y[:self.count]
+        hits = ~self.dead[:self.count] & (x < rect.right) & (x + self.size > rect.left) & (y < rect.bottom) & (y + self.size > rect.top)
+        return [self.npcs[index] for index in np.flatnonzero(hits)]
+
+    def get_npcs_in_radius(self, center, radius):
+        # Living NPCs whose center is at most radius away from the given center
+        distance_sq = (self.x[:self.count] + self.half_size - center[0]) ** 2 + (self.y[:self.count] + self.half_size - center[1]) ** 2
+        hits = ~self.dead[:self.count] & (distance_sq <= radius * radius)
+        return [self.npcs[index] for index in np.flatnonzero(hits)]
+
+    def despawn_all_npcs(self):
+        for handle in self.npcs:
+            handle.index = None
+        self.npcs = []
+        self.count = 0
+
+    def draw(self, surface, camera, alpha=1.0):
+        # Returns screen rects of drawn NPCs and hearts, NPCs are drawn between their last two positions
+        drawn_rects = []
+        for index in np.flatnonzero(~self.dead[:self.count]):
+            frames = self.flipped_frames if self.image_flipped[index] else self.frames
+            image = frames[self.image_anim[index]][self.image_index[index]]
+            x, y = interpolate((int(self.previous_x[index]), int(self.previous_y[index])), (int(self.x[index]), int(self.y[index])), alpha)
+            drawn_rects.append(surface.blit(image, (x - camera.x, y - camera.y)))
+
+        for heart in self.hearts:
+            drawn_rects.append(surface.blit(heart.image, heart.rect.move(-camera.x, -camera.y)))
+        return drawn_rects
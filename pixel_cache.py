@@ -0,0 +1,90 @@
+import hashlib
+import io
+import mmap
+import os
+import struct
+import threading
+import pygame
+
+PIXEL_CACHE_DIR = ".pixel_cache"
+MAGIC = b"PXC1"
+HEADER = struct.Struct("<4s4sII")  # Magic, byte order of the pixels, width, height
+PIXEL_FORMATS = {
+    (0xff0000, 0xff00, 0xff, 0xff000000): "BGRA",
+    (0xff, 0xff00, 0xff0000, 0xff000000): "RGBA",
+}
+
+
+def get_pixel_format(surface):
+    # Byte order matching the surface in memory, so loaded pixels need no conversion
+    return PIXEL_FORMATS.get(surface.get_masks(), "RGBA")
+
+
+class PixelCache:
+    def __init__(self, cache_dir=PIXEL_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def get_cache_path(self, data, size):
+        # Entries are keyed by the content of the source file, so a changed asset gets a new entry
+        digest = hashlib.sha1(data).hexdigest()
+        size_name = f"{size[0]}x{size[1]}" if size else "native"
+        return os.path.join(self.cache_dir, f"{digest}_{size_name}.px")
+
+    def load_image(self, path, size=None):
+        # Image with alpha in display format scaled to size, from the cache when it was prepared before
+        with open(path, "rb") as file:
+            data = file.read()
+        if pygame.display.get_surface() is None:
+            # Display format is unknown before the window exists, nothing is cached
+            image = pygame.image.load(io.BytesIO(data), path)
+            return pygame.transform.scale(image, size) if size else image
+
+        cache_path = self.get_cache_path(data, size)
+        image = self.read(cache_path)
+        if image is not None:
+            self.hits += 1
+            return image
+
+        self.misses += 1
+        image = pygame.image.load(io.BytesIO(data), path).convert_alpha()
+        if size:
+            image = pygame.transform.scale(image, size)
+        self.write(cache_path, image)
+        return image
+
+    def read(self, cache_path):
+        # Pixels are mapped from the file, the surface keeps the mapping alive
+        try:
+            with open(cache_path, "rb") as file:
+                pixels = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):
+            return None
+        if len(pixels) < HEADER.size:
+            return None
+        magic, pixel_format, width, height = HEADER.unpack_from(pixels)
+        if magic != MAGIC or len(pixels) != HEADER.size + width * height * 4:
+            return None
+        return pygame.image.frombuffer(memoryview(pixels)[HEADER.size:], (width, height), pixel_format.decode())
+
+    def write(self, cache_path, image):
+        # Written under a temporary name first, so a broken file is never read
+        pixel_format = get_pixel_format(image)
+        header = HEADER.pack(MAGIC, pixel_format.encode(), image.get_width(), image.get_height())
+        temporary_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temporary_path, "wb") as file:
+                file.write(header)
+                file.write(pygame.image.tobytes(image, pixel_format))
+            os.replace(temporary_path, cache_path)
+        except OSError:
+            pass  # Running without the cache is only slower
+
+
+pixel_cache = PixelCache()
+
+
+def load_scaled_image(path, size=None):
+    return pixel_cache.load_image(path, size)
@@ -1,8 +1,12 @@
 import os
 import pygame
-import pytmx
 from sprite import Sprite
-from utils import get_tile_under_player, get_walk_tile_properties, get_structure_tile_properties, get_spawn_position
+from texture_atlas import atlas
+from pixel_cache import load_scaled_image
+from colliders import collides_with_objects
+from audio import audio
+from game_clock import game_clock, interpolate
+from utils import get_tile_under_player, is_tile_walkable, get_teleport_map
 
 class Player(Sprite):
     DIRECTIONS = ["Down", "Up", "Left", "Right"]
@@ -22,6 +26,7 @@ class Player(Sprite):
         self.image = self.animations[self.current_animation][0]
         self.is_dead = False
         self.rect.topleft = (spawn_x, spawn_y)
+        self.previous_position = self.rect.topleft  # Position before the last simulation step
         self.speed = self.BASE_SPEED
         self.is_sprinting = False
         self.spawn_x = spawn_x
@@ -46,24 +51,22 @@ class Player(Sprite):
             self.rect.x, self.rect.y + self.rect.height // 2, self.rect.width, self.rect.height // 2
         )
 
-        # Load footstep sounds
-        self.footstep_sound = pygame.mixer.Sound("Assets/Sounds/Player/footstep.wav")
-        self.teleported_sound = pygame.mixer.Sound("Assets/Sounds/Player/teleport.mp3")
-        self.ough_sound = pygame.mixer.Sound("Assets/Sounds/Player/ough.mp3")
-        self.footstep_sound.set_volume(0.6)
-        self.teleported_sound.set_volume(0.8)
-        self.ough_sound.set_volume(0.6)
+        # Footsteps are played at most once per interval
         self.last_footstep_time = 0
         self.footstep_index = 0
 
     def play_footstep_sound(self):
-        now = pygame.time.get_ticks()
+        now = game_clock.get_ticks()
         interval = self.SPRINT_FOOTSTEP_INTERVAL if self.is_sprinting else self.FOOTSTEP_INTERVAL
         if now - self.last_footstep_time > interval:
-            self.footstep_sound.play()
+            audio.play("footstep")
             self.last_footstep_time = now
 
     def load_animations(self):
+        # Frames baked into the texture atlas when available
+        animations = atlas.get_animations(self.asset_path, (self.rect.width, self.rect.height))
+        if animations is not None:
+            return animations
         animations = {}
         for direction in self.DIRECTIONS:
             path = os.path.join(self.asset_path, direction)
@@ -72,8 +75,11 @@ class Player(Sprite):
         return animations
 
     def load_image(self, image_path):
-        image = pygame.image.load(image_path)
-        return pygame.transform.scale(image, (self.rect.width, self.rect.height))
+        return load_scaled_image(image_path, (self.rect.width, self.rect.height))
+
+    def get_render_rect(self, alpha):
+        # Rect for a frame rendered between the last two simulation steps
+        return pygame.Rect(interpolate(self.previous_position, self.rect.topleft, alpha), self.rect.size)
 
     def move(self, dx, dy):
         self.rect.move_ip(dx, dy)
@@ -103,12 +109,13 @@ class Player(Sprite):
 
     def take_damage(self, damage):
         self.health -= damage
-        self.ough_sound.play()
+        audio.play("player_hurt")
         if self.health <= 0:
             self.is_dead = True
             self.health = self.last_health
 
     def handle_movement(self, keys, tmx_data, camera_x, camera_y):
+        self.previous_position = self.rect.topleft
         direction, dx, dy = self.get_movement_direction(keys)
         speed = self.adjust_speed_for_sprint(keys, direction)
 
@@ -157,32 +164,22 @@ class Player(Sprite):
         if not self.is_tile_walkable(tile_x, tile_y, tmx_data):
             return False
 
-        tile_structure_properties = get_structure_tile_properties(tile_x, tile_y, tmx_data)
-        if tile_structure_properties and tile_structure_properties.get("teleport") == 1:
-            self.new_map = tile_structure_properties.get("map")
+        teleport_map = get_teleport_map(tile_x, tile_y, tmx_data)
+        if teleport_map:
+            self.new_map = teleport_map
             self.teleported = True
             self.last_health = self.health
-            self.teleported_sound.play()
+            audio.play("teleport")
             return False
 
         return not self.check_collision_with_objects(new_bottom_half_rect, tmx_data, camera_x, camera_y)
 
     def is_tile_walkable(self, tile_x, tile_y, tmx_data):
-        properties = get_walk_tile_properties(tile_x, tile_y, tmx_data)
-        return properties and properties.get("canWalk") == 1
+        return is_tile_walkable(tile_x, tile_y, tmx_data)
 
     def is_teleported(self):
         return self.teleported
 
     def check_collision_with_objects(self, new_rect, tmx_data, camera_x, camera_y):
-        for layer in tmx_data.layers:
-            if isinstance(layer, pytmx.TiledObjectGroup):
-                for obj in layer:
-                    # Make different collider based on object size
-                    if obj.width > obj.height:
-                        obj_rect = pygame.Rect(obj.x + 10, obj.y + obj.height / 2.2, obj.width - 20, obj.height/2)
-                    else:
-                        obj_rect = pygame.Rect(obj.x + 10, obj.y + obj.height / 2.2, obj.width - 20, obj.height / 2)
-                    if new_rect.colliderect(obj_rect):
-                        return True
-        return False
+        # Only colliders in grid cells around the rect are tested
+        return collides_with_objects(new_rect, tmx_data)
@@ -1,10 +1,11 @@
 import pygame
+from text_cache import render_text
 
 pygame.init()
 
 SCREEN_WIDTH, SCREEN_HEIGHT = pygame.display.Info().current_w, pygame.display.Info().current_h
-TITLE_FONT = pygame.font.SysFont(None, 70)  # Väčší font pre nadpisy
-BUTTON_FONT = pygame.font.SysFont(None, 40)  # Menší font pre tlačidlá
+TITLE_FONT = (None, 70, False)  # Väčší font pre nadpisy
+BUTTON_FONT = (None, 40, False)  # Menší font pre tlačidlá
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 
 
@@ -16,10 +17,10 @@ def intro_screen():
 
     while intro:
         screen.fill((0, 0, 0))
-        title_text = TITLE_FONT.render("Teleported to the NIGHTMARE", True, (255, 255, 255))
+        title_text = render_text("Teleported to the NIGHTMARE", TITLE_FONT, (255, 255, 255))
         screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, SCREEN_HEIGHT // 3))
 
-        title_text = TITLE_FONT.render("Vytvoril Adam Gál", True, (255, 255, 255))
+        title_text = render_text("Vytvoril Adam Gál", TITLE_FONT, (255, 255, 255))
         screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, SCREEN_HEIGHT - title_text.get_height() - 20))
 
         pygame.draw.rect(screen, (50, 50, 50), start_button, border_radius=10)
@@ -27,8 +28,8 @@ def intro_screen():
         pygame.draw.rect(screen, (255, 255, 255), start_button, 3, border_radius=10)
         pygame.draw.rect(screen, (255, 255, 255), quit_button, 3, border_radius=10)
 
-        start_text = BUTTON_FONT.render("Spustiť hru", True, (200, 200, 200))
-        quit_text = BUTTON_FONT.render("Ukončiť", True, (200, 200, 200))
+        start_text = render_text("Spustiť hru", BUTTON_FONT, (200, 200, 200))
+        quit_text = render_text("Ukončiť", BUTTON_FONT, (200, 200, 200))
 
         screen.blit(start_text, (start_button.x + (button_width - start_text.get_width()) // 2,
                                  start_button.y + (button_height - start_text.get_height()) // 2))
@@ -57,7 +58,7 @@ def pause_screen():
 
     while paused:
         screen.fill((0, 0, 0))
-        pause_text = TITLE_FONT.render("Hra pozastavená", True, (255, 255, 0))
+        pause_text = render_text("Hra pozastavená", TITLE_FONT, (255, 255, 0))
         screen.blit(pause_text, (SCREEN_WIDTH // 2 - pause_text.get_width() // 2, SCREEN_HEIGHT // 3))
 
         pygame.draw.rect(screen, (50, 50, 50), resume_button, border_radius=10)
@@ -65,8 +66,8 @@ def pause_screen():
         pygame.draw.rect(screen, (255, 255, 255), resume_button, 3, border_radius=10)
         pygame.draw.rect(screen, (255, 255, 255), quit_button, 3, border_radius=10)
 
-        resume_text = BUTTON_FONT.render("Pokračovať", True, (200, 200, 200))
-        quit_text = BUTTON_FONT.render("Ukončiť", True, (200, 200, 200))
+        resume_text = render_text("Pokračovať", BUTTON_FONT, (200, 200, 200))
+        quit_text = render_text("Ukončiť", BUTTON_FONT, (200, 200, 200))
 
         screen.blit(resume_text, (resume_button.x + (button_width - resume_text.get_width()) // 2,
                                   resume_button.y + (button_height - resume_text.get_height()) // 2))
@@ -96,16 +97,16 @@ def game_over_screen():
 
     while game_over:
         screen.fill((0, 0, 0))
-        game_over_text = TITLE_FONT.render("Koniec hry!", True, (255, 0, 0))
+        game_over_text = render_text("Koniec hry!", TITLE_FONT, (255, 0, 0))
         screen.blit(game_over_text, (SCREEN_WIDTH // 2 - game_over_text.get_width() // 2, SCREEN_HEIGHT // 3))
 
-        game_over_text = TITLE_FONT.render("Vytvoril Adam Gál", True, (255, 255, 255))
+        game_over_text = render_text("Vytvoril Adam Gál", TITLE_FONT, (255, 255, 255))
         screen.blit(game_over_text, (SCREEN_WIDTH // 2 - game_over_text.get_width() // 2, SCREEN_HEIGHT - game_over_text.get_height() - 20))
 
         pygame.draw.rect(screen, (50, 50, 50), quit_button, border_radius=10)
         pygame.draw.rect(screen, (255, 255, 255), quit_button, 3, border_radius=10)
 
-        quit_text = BUTTON_FONT.render("Ukončiť", True, (200, 200, 200))
+        quit_text = render_text("Ukončiť", BUTTON_FONT, (200, 200, 200))
 
         screen.blit(quit_text, (quit_button.x + (button_width - quit_text.get_width()) // 2,
                                 quit_button.y + (button_height - quit_text.get_height()) // 2))
@@ -119,3 +120,20 @@ def game_over_screen():
             elif event.type == pygame.MOUSEBUTTONDOWN and quit_button.collidepoint(event.pos):
                 pygame.quit()
                 quit()
+
+
+def loading_screen(progress):
+    # One frame of the loading screen, shown while the next level is still being prepared
+    bar_width, bar_height = 400, 30
+    progress_bar = pygame.Rect(SCREEN_WIDTH // 2 - bar_width // 2, SCREEN_HEIGHT // 2, bar_width, bar_height)
+
+    screen.fill((0, 0, 0))
+    loading_text = render_text("Načítava sa...", TITLE_FONT, (255, 255, 255))
+    screen.blit(loading_text, (SCREEN_WIDTH // 2 - loading_text.get_width() // 2, SCREEN_HEIGHT // 3))
+
+    pygame.draw.rect(screen, (50, 50, 50), progress_bar, border_radius=10)
+    pygame.draw.rect(screen, (200, 200, 200), (progress_bar.x, progress_bar.y, bar_width * progress, bar_height), border_radius=10)
+    pygame.draw.rect(screen, (255, 255, 255), progress_bar, 3, border_radius=10)
+
+    pygame.display.flip()
+    pygame.event.pump()
@@ -0,0 +1,23 @@
+import hashlib
+import os
+
+
+def get_file_hash(path):
+    with open(path, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def describe_source(path):
+    stat = os.stat(path)
+    return {"path": path, "size": stat.st_size, "mtime": stat.st_mtime_ns, "sha1": get_file_hash(path)}
+
+
+def is_source_fresh(source):
+    # Unchanged size and time are enough, a touched file is compared by its content
+    try:
+        stat = os.stat(source["path"])
+    except OSError:
+        return False
+    if stat.st_size != source["size"]:
+        return False
+    return stat.st_mtime_ns == source["mtime"] or get_file_hash(source["path"]) == source["sha1"]
@@ -0,0 +1,66 @@
+import pygame
+
+
+class SpatialHash:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> [(order, rect, item)]
+        self.count = 0
+
+    def get_cells(self, rect):
+        # All grid cells touched by the rect
+        start_x, end_x = int(rect.left // self.cell_size), int((rect.right - 1) // self.cell_size)
+        start_y, end_y = int(rect.top // self.cell_size), int((rect.bottom - 1) // self.cell_size)
+        return [(cell_x, cell_y) for cell_y in range(start_y, end_y + 1) for cell_x in range(start_x, end_x + 1)]
+
+    def insert(self, item, rect):
+        # Returns the entry of the item, needed to move or remove it later
+        rect = pygame.Rect(rect)
+        entry = (self.count, rect, item)
+        self.count += 1
+        for cell in self.get_cells(rect):
+            self.cells.setdefault(cell, []).append(entry)
+        return entry
+
+    def move(self, entry, rect):
+        # Update the rect of an inserted entry, it keeps its insertion order
+        rect = pygame.Rect(rect)
+        old_cells, new_cells = self.get_cells(entry[1]), self.get_cells(rect)
+        entry[1].update(rect)
+        if old_cells != new_cells:
+            self.remove_from_cells(entry, old_cells)
+            for cell in new_cells:
+                self.cells.setdefault(cell, []).append(entry)
+
+    def remove(self, entry):
+        self.remove_from_cells(entry, self.get_cells(entry[1]))
+
+    def remove_from_cells(self, entry, cells):
+        for cell in cells:
+            entries = self.cells[cell]
+            entries.remove(entry)
+            if not entries:
+                del self.cells[cell]
+
+    def clear(self):
+        self.cells.clear()
+        self.count = 0
+
+    def query(self, rect):
+        # Items whose rect collides with the given rect, in insertion order
+        rect = pygame.Rect(rect)
+        found = {}
+        for cell in self.get_cells(rect):
+            for entry in self.cells.get(cell, ()):
+                if entry[0] not in found and rect.colliderect(entry[1]):
+                    found[entry[0]] = entry[2]
+        return [found[order] for order in sorted(found)]
+
+    def collides(self, rect):
+        # True if any stored rect collides with the given rect
+        rect = pygame.Rect(rect)
+        for cell in self.get_cells(rect):
+            for entry in self.cells.get(cell, ()):
+                if rect.colliderect(entry[1]):
+                    return True
+        return False
@@ -0,0 +1,53 @@
+import random
+import numpy as np
+import pytmx
+from tile_flags import get_tile_flags, WALKABLE
+
+REJECTION_TRIES = 8  # Random draws before falling back to filtering the whole pool
+
+
+class SpawnPool:
+    def __init__(self, tmx_data):
+        # Pixel positions of walkable tiles, one entry for every visible layer with a tile on that cell
+        walkable = (get_tile_flags(tmx_data).flags & WALKABLE) != 0
+        layer_positions = []
+        for layer in tmx_data.visible_layers:
+            if isinstance(layer, pytmx.TiledTileLayer):
+                gids = np.array(layer.data, dtype=np.int64)
+                layer_positions.append(np.argwhere((gids != 0) & walkable)[:, ::-1])
+
+        if layer_positions:
+            tiles = np.concatenate(layer_positions)
+        else:
+            tiles = np.zeros((0, 2), dtype=np.int64)
+        self.positions = (tiles * (tmx_data.tilewidth, tmx_data.tileheight)).astype(np.int32)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def get_position(self, index):
+        x, y = self.positions[index]
+        return int(x), int(y)
+
+    def sample(self):
+        # Random walkable position, None if the map has no walkable tiles
+        if not len(self.positions):
+            return None
+        return self.get_position(random.randrange(len(self.positions)))
+
+    def sample_far_from(self, center_x, center_y, min_distance):
+        # Random walkable position farther than min_distance from the center, None if there is none
+        if not len(self.positions):
+            return None
+        min_distance_sq = min_distance * min_distance
+        for _ in range(REJECTION_TRIES):
+            x, y = self.get_position(random.randrange(len(self.positions)))
+            if (x - center_x) ** 2 + (y - center_y) ** 2 > min_distance_sq:
+                return x, y
+
+        # Most of the pool is near the center, choose only from positions outside of the circle
+        offsets = self.positions - np.array((center_x, center_y), dtype=np.float64)
+        far_indexes = np.flatnonzero((offsets ** 2).sum(axis=1) > min_distance_sq)
+        if not len(far_indexes):
+            return None
+        return self.get_position(far_indexes[random.randrange(len(far_indexes))])
@@ -1,12 +1,39 @@
-import time
 import pygame
+from text_cache import render_text
+from pixel_cache import load_scaled_image
+from game_clock import game_clock
+
+ABILITY_FONT = (None, 30, False)
+
+class CachedLayer:
+    # Surface of one HUD widget, redrawn only when the values it shows change
+    def __init__(self):
+        self.key = None
+        self.surface = None
+        self.rect = None
+
+    def draw(self, surface, key, bounds, render):
+        # render(layer) draws the widget onto a transparent layer the size of bounds
+        if key != self.key:
+            self.key = key
+            self.rect = pygame.Rect(bounds)
+            if self.surface is not None and self.surface.get_size() == self.rect.size:
+                self.surface.fill((0, 0, 0, 0))  # Same size, the layer is cleared instead of allocated again
+            else:
+                self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+            render(self.surface)
+        return surface.blit(self.surface, self.rect)
 
 class StaminaBar:
     def __init__(self, player):
         self.player = player
+        self.layer = CachedLayer()
 
-    def get_stamina_color(self):
-        ratio = self.player.stamina / self.player.max_stamina
+    def get_fill_width(self, width):
+        # Filled part of the bar in whole pixels, the layer is redrawn only when it changes
+        return int(width * self.player.stamina / self.player.max_stamina)
+
+    def get_stamina_color(self, ratio):
         if ratio > 0.5:
             transition_ratio = (ratio - 0.5) * 2
             r = int(255 * (1 - transition_ratio))
@@ -20,31 +47,36 @@ class StaminaBar:
         return (r, g, b)
 
     def draw(self, surface, x, y, width, height):
+        # Returns the screen area of the bar, empty when the bar is hidden
         if self.player.stamina != self.player.max_stamina:
-            # Draw the background for the stamina bar
-            pygame.draw.rect(surface, (50, 50, 50), (x, y, width, height))  # Background
+            fill_width = self.get_fill_width(width)
+            key = (fill_width, self.player.stamina_recharge_needed, x, y, width, height)
+            return self.layer.draw(surface, key, (x, y, width, height), lambda layer: self.render(layer, 0, 0, width, height, fill_width))
+        return pygame.Rect(x, y, 0, 0)
+
+    def render(self, surface, x, y, width, height, fill_width):
+        # Draw the background for the stamina bar
+        pygame.draw.rect(surface, (50, 50, 50), (x, y, width, height))  # Background
 
-            # Calculate stamina ratio and color
-            stamina_ratio = self.player.stamina / self.player.max_stamina
-            bar_color = self.get_stamina_color() if not self.player.stamina_recharge_needed else (128, 128, 128)
+        # Color follows the drawn width, so it changes together with the bar
+        bar_color = self.get_stamina_color(fill_width / width) if not self.player.stamina_recharge_needed else (128, 128, 128)
 
-            # Draw the stamina bar
-            pygame.draw.rect(surface, bar_color, (x, y, width * stamina_ratio, height))
+        # Draw the stamina bar
+        pygame.draw.rect(surface, bar_color, (x, y, fill_width, height))
 
-            # Draw black border around the stamina bar
-            pygame.draw.rect(surface, (0, 0, 0), (x, y, width, height), 2)
+        # Draw black border around the stamina bar
+        pygame.draw.rect(surface, (0, 0, 0), (x, y, width, height), 2)
 
 class AbilityDisplay:
     def __init__(self, ability_system):
         self.ability_system = ability_system
 
-        # Load ability UI images
-        self.ability_icons = {
-            "Fireball": pygame.image.load("Assets/UI/Fireball.png"),
-            "Iceblast": pygame.image.load("Assets/UI/Iceblast.png"),
-            "Wind": pygame.image.load("Assets/UI/Wind.png"),
-            "Earthspikes": pygame.image.load("Assets/UI/Earthspikes.png"),
-        }
+        self.icon_size = 50
+        self.spacing = 10
+
+        # Load ability UI images, scaled once and not every time the display is redrawn
+        self.ability_icons = {ability: load_scaled_image(f"Assets/UI/{ability}.png", (self.icon_size, self.icon_size))
+                              for ability in ("Fireball", "Iceblast", "Wind", "Earthspikes")}
 
         # Colors for abilities
         self.ability_colors = {
@@ -54,41 +86,46 @@ class AbilityDisplay:
             "Earthspikes": (160, 100, 60)  # Brown
         }
 
-        self.icon_size = 50
-        self.spacing = 10
+        self.layer = CachedLayer()
+
+    def get_text_image(self, selected_ability):
+        # Selected ability name
+        highlight_color = self.ability_colors.get(selected_ability, (255, 255, 255))  # Default: biela
+        return render_text(f"Selected: {selected_ability}", ABILITY_FONT, highlight_color, (0, 0, 0), 2)  # Text vo farbe ability s čiernym obrysom
 
     def draw(self, surface, x, y):
-        font = pygame.font.SysFont(None, 30)
+        # Returns the screen area covered by icons and text
+        selected_ability = self.ability_system.selected_ability
+        abilities = tuple(self.ability_system.abilities)
+        icons_width = len(abilities) * (self.icon_size + self.spacing) - self.spacing
+        icons_rect = pygame.Rect(x, y, icons_width, self.icon_size).inflate(8, 8)
+        text_rect = self.get_text_image(selected_ability).get_rect(topleft=(x - 2, y + self.icon_size + 8))
+        bounds = icons_rect.union(text_rect)
+        key = (selected_ability, abilities, x, y)
+        return self.layer.draw(surface, key, bounds, lambda layer: self.render(layer, x - bounds.x, y - bounds.y))
+
+    def render(self, surface, x, y):
         selected_ability = self.ability_system.selected_ability
         highlight_color = self.ability_colors.get(selected_ability, (255, 255, 255))  # Default: biela
 
         for index, ability in enumerate(self.ability_system.abilities):
-            icon = self.ability_icons[ability]
             icon_rect = pygame.Rect(x + index * (self.icon_size + self.spacing), y, self.icon_size, self.icon_size)
 
-            surface.blit(pygame.transform.scale(icon, (self.icon_size, self.icon_size)), icon_rect)
+            surface.blit(self.ability_icons[ability], icon_rect)
             if ability == selected_ability:
                 pygame.draw.rect(surface, (0, 0, 0), icon_rect.inflate(8, 8), 6)
                 pygame.draw.rect(surface, highlight_color, icon_rect.inflate(4, 4), 4)
 
-        # Display selected ability name
-        text = f"Selected: {selected_ability}"
-        text_surface = font.render(text, True, highlight_color)  # Hlavný text vo farbe ability
-        text_outline = font.render(text, True, (0, 0, 0))  # Obrys (čierny)
-
         text_x = x
         text_y = y + self.icon_size + 10
-        offsets = [(-2, 0), (2, 0), (0, -2), (0, 2)]
-        for dx, dy in offsets:
-            surface.blit(text_outline, (text_x + dx, text_y + dy))
-
-        surface.blit(text_surface, (text_x, text_y))
+        surface.blit(self.get_text_image(selected_ability), (text_x - 2, text_y - 2))
 
 class HealthBar:
     def __init__(self, player):
         self.player = player
-        self.heart_image = pygame.image.load("Assets/UI/heart.png").convert_alpha()  # Načítanie obrázka srdca
         self.heart_size = 50  # Veľkosť srdca
+        self.heart_image = load_scaled_image("Assets/UI/heart.png", (self.heart_size, self.heart_size))  # Načítanie obrázka srdca
+        self.layer = CachedLayer()
 
     def get_health_color(self):
         ratio = self.player.health / self.player.max_health
@@ -105,6 +142,13 @@ class HealthBar:
         return (r, g, b)
 
     def draw(self, surface, x, y, width, height):
+        # Returns the screen area of the bar and heart
+        heart_rect = pygame.Rect(x - self.heart_size, y + (height // 2) - (self.heart_size // 2), self.heart_size, self.heart_size)
+        bounds = heart_rect.union((x, y, width, height))
+        key = (self.player.health, self.player.max_health, x, y, width, height)
+        return self.layer.draw(surface, key, bounds, lambda layer: self.render(layer, x - bounds.x, y - bounds.y, width, height))
+
+    def render(self, surface, x, y, width, height):
         # HealthBar background
         pygame.draw.rect(surface, (50, 50, 50), (x, y, width, height))
 
@@ -116,7 +160,7 @@ class HealthBar:
         # Heart image
         heart_x = x - self.heart_size
         heart_y = y + (height // 2) - (self.heart_size // 2)
-        surface.blit(pygame.transform.scale(self.heart_image, (self.heart_size, self.heart_size)), (heart_x, heart_y))
+        surface.blit(self.heart_image, (heart_x, heart_y))
 
         pygame.draw.rect(surface, (0, 0, 0), (x, y, width, height), 2)  # Čierny rám s hrúbkou 3 pixely
 
@@ -127,14 +171,15 @@ class TimerDisplay:
         self.font_size = 50  # Väčší font
 
     def start(self):
-        self.start_timer = time.time()
+        self.start_timer = game_clock.time()
 
     def reset(self):
         self.start_timer = None
 
     def draw(self, surface, x, y):
+        # Returns the screen area of the time text, empty when the timer is not running
         if self.start_timer is not None:
-            elapsed_time = time.time() - self.start_timer
+            elapsed_time = game_clock.time() - self.start_timer
             remaining_time = max(0, self.time_limit - elapsed_time)
             minutes = int(remaining_time // 60)
             seconds = int(remaining_time % 60)
@@ -143,16 +188,7 @@ class TimerDisplay:
             # If remaining time is less than 15 seconds make text RED
             text_color = (255, 0, 0) if remaining_time <= 15 else (255, 255, 255)
 
-            # Load font
-            font = pygame.font.SysFont(None, self.font_size)
-            text_surface = font.render(time_text, True, text_color)
-
-            # Outline
-            outline_color = (0, 0, 0)
-            offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-
-            for dx, dy in offsets:
-                shadow_surface = font.render(time_text, True, outline_color)
-                surface.blit(shadow_surface, (x + dx, y + dy))
-
-            surface.blit(text_surface, (x, y))
\ No newline at end of file
+            # Text with black outline
+            text_image = render_text(time_text, (None, self.font_size, False), text_color, (0, 0, 0))
+            return surface.blit(text_image, (x - 1, y - 1))
+        return pygame.Rect(x, y, 0, 0)
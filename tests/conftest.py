@@ -0,0 +1,31 @@
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LAVA_MAP = "Assets/Maps/LavaPlace/Map/LavaPlace.tmx"
+AIR_MAP = "Assets/Maps/AirPlace/Map/AirPlace.tmx"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def display():
+    # Asset paths are relative to the game directory, images are converted to the display format
+    os.chdir(ROOT)
+    pygame.init()
+    pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    yield
+    pygame.quit()
+
+
+@pytest.fixture(scope="session")
+def lava_map():
+    from map_package import load_map
+    return load_map(LAVA_MAP)
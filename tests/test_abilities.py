@@ -0,0 +1,19 @@
+import math
+import abilities
+from abilities import get_rotated_frames, get_rotation_step, release_rotated_frames
+from asset_cache import load_animation_frames, release
+
+FIRE = "Assets/Abilities/Fire"
+
+
+def test_rotated_frames_are_shared_until_released():
+    frames = load_animation_frames(FIRE)
+    step = get_rotation_step(math.pi / 2)
+    rotated = get_rotated_frames(FIRE, frames, step)
+    assert get_rotated_frames(FIRE, frames, step) is rotated
+
+    release_rotated_frames()
+    assert abilities.rotated_frames == {}
+    assert get_rotated_frames(FIRE, frames, step) is not rotated
+    release(frames)
+    release_rotated_frames()
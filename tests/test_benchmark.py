@@ -0,0 +1,18 @@
+import re
+from benchmark import SECTIONS, get_statistics
+
+
+def test_every_main_loop_lap_is_its_own_reported_section():
+    with open("main.py") as file:
+        laps = re.findall(r'frame_profiler\.lap\("(\w+)"\)', file.read())
+    assert len(laps) == len(set(laps))
+    assert ("frame", *laps) == SECTIONS
+    assert len(SECTIONS) == len(set(SECTIONS))
+
+
+def test_statistics_cover_all_sections():
+    frames = [{"frame": 0.002, "player": 0.001}, {"frame": 0.004}]
+    statistics = get_statistics(frames)
+    assert list(statistics) == list(SECTIONS)
+    assert statistics["frame"]["mean"] == 3.0
+    assert statistics["player"]["p50"] == 0.5
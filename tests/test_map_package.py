@@ -0,0 +1,61 @@
+import json
+import os
+import struct
+import pytmx
+import map_package
+from conftest import AIR_MAP
+from map_package import HEADER, ALIGNMENT, get_package_path, load_map, read_package
+
+
+def write_with_tree(package_path, source_path, tree):
+    # Copy of a compiled package whose pickled map is replaced
+    with open(source_path, "rb") as file:
+        data = file.read()
+    magic, version, metadata_length = HEADER.unpack_from(data)
+    metadata = json.loads(data[HEADER.size:HEADER.size + metadata_length])
+    data_start = HEADER.size + metadata_length
+    data_start += -data_start % ALIGNMENT
+    arrays = data[data_start:data_start + metadata["tree"]["offset"]]
+
+    metadata["tree"]["length"] = len(tree)
+    encoded = json.dumps(metadata).encode()
+    with open(package_path, "wb") as file:
+        file.write(HEADER.pack(magic, version, len(encoded)))
+        file.write(encoded)
+        file.write(bytes(-file.tell() % ALIGNMENT))
+        file.write(arrays)
+        file.write(tree)
+
+
+def get_call_pickle(module, name, argument):
+    # Protocol 4 pickle calling module.name(argument) while it is loaded
+    argument = argument.encode()
+    return b"\x80\x04c" + f"{module}\n{name}\n".encode() + b"X" + struct.pack("<I", len(argument)) + argument + b"\x85R."
+
+
+def test_package_calling_other_globals_is_rejected(tmp_path, monkeypatch):
+    load_map(AIR_MAP)  # Compiled package next to the map
+    marker = tmp_path / "created"
+    package_path = str(tmp_path / "AirPlace.tmxc")
+    for module, name in [("pytmx.pytmx", "os.mkdir"), ("os", "mkdir")]:
+        write_with_tree(package_path, get_package_path(AIR_MAP), get_call_pickle(module, name, str(marker)))
+        assert read_package(package_path) is None
+        assert not marker.exists()
+
+    # The map is parsed from the TMX file and compiled again instead
+    compiled = []
+    monkeypatch.setattr(map_package, "get_package_path", lambda tmx_path: package_path)
+    monkeypatch.setattr(map_package, "compile_map", lambda tmx_path: compiled.append(tmx_path) or pytmx.TiledMap(tmx_path))
+    assert isinstance(load_map(AIR_MAP), pytmx.TiledMap)
+    assert compiled == [AIR_MAP]
+    assert not marker.exists()
+
+
+def test_truncated_package_is_treated_as_missing(tmp_path):
+    load_map(AIR_MAP)
+    with open(get_package_path(AIR_MAP), "rb") as file:
+        data = file.read()
+    package_path = tmp_path / "AirPlace.tmxc"
+    package_path.write_bytes(data[:len(data) // 2])
+    assert read_package(str(package_path)) is None
+    assert os.path.exists(get_package_path(AIR_MAP))
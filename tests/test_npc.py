@@ -0,0 +1,51 @@
+import pygame
+from game_clock import game_clock
+from npc import NPC, NPCManager, NPC_GRID_CELL_SIZE
+
+LAVA_NPCS = (0, 40, 40, "Assets/Maps/LavaPlace/Npc/Demon", 50, 40, 5)
+
+
+class Player:
+    def __init__(self, x, y):
+        self.rect = pygame.Rect(x, y, 50, 50)
+
+
+def make_manager(tmx_data):
+    return NPCManager(pygame.sprite.Group(), tmx_data, *LAVA_NPCS)
+
+
+def test_failed_spawn_is_counted_and_retried(lava_map, monkeypatch):
+    manager = make_manager(lava_map)
+    player = Player(100, 100)
+    positions = iter([None, (200, 200)])
+    monkeypatch.setattr(manager, "get_spawn_position", lambda player, min_distance: next(positions))
+    game_clock.tick()
+
+    manager.update(player, 0, 0)
+    assert manager.failed_spawns == 1
+    assert len(manager.npcs) == 0
+
+    manager.update(player, 0, 0)
+    assert manager.failed_spawns == 1
+    assert len(manager.npcs) == 1
+
+
+def test_npc_moved_across_cells_is_found_by_queries(lava_map, monkeypatch):
+    manager = make_manager(lava_map)
+    manager.max_enemies = 1
+    player = Player(2000, 2000)
+    monkeypatch.setattr(manager, "get_spawn_position", lambda player, min_distance: (100, 100))
+    monkeypatch.setattr(NPC, "update", lambda self, *args: self.rect.move_ip(60, 0))
+    manager.spawn_npc(player)
+    npc = manager.npcs.sprites()[0]
+
+    for _ in range(4):
+        manager.update(player, 0, 0)
+    assert npc.rect.x // NPC_GRID_CELL_SIZE != 100 // NPC_GRID_CELL_SIZE
+    assert manager.get_npcs_in_rect(npc.rect) == [npc]
+    assert manager.get_npcs_in_radius(npc.rect.center, 10) == [npc]
+    assert manager.get_npcs_in_rect(pygame.Rect(100, 100, 50, 50)) == []
+
+    npc.kill()
+    manager.update(player, 0, 0)
+    assert manager.grid.query(npc.rect) == []
@@ -0,0 +1,24 @@
+import pygame
+from spatial_hash import SpatialHash
+
+
+def test_moved_entry_leaves_its_old_cells():
+    grid = SpatialHash(128)
+    first = grid.insert("first", (10, 10, 20, 20))
+    grid.insert("second", (300, 10, 20, 20))
+
+    grid.move(first, (310, 20, 20, 20))
+    assert grid.query((0, 0, 128, 128)) == []
+    assert grid.query((256, 0, 128, 128)) == ["first", "second"]  # Insertion order is kept
+
+    grid.remove(first)
+    assert grid.query((256, 0, 128, 128)) == ["second"]
+    assert (0, 0) not in grid.cells
+
+
+def test_move_within_a_cell_updates_the_rect():
+    grid = SpatialHash(128)
+    entry = grid.insert("item", (10, 10, 20, 20))
+    grid.move(entry, pygame.Rect(60, 60, 20, 20))
+    assert grid.query((0, 0, 40, 40)) == []
+    assert grid.query((70, 70, 5, 5)) == ["item"]
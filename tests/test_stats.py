@@ -0,0 +1,34 @@
+import pygame
+from stats import StaminaBar
+
+
+class Player:
+    def __init__(self, stamina):
+        self.stamina = stamina
+        self.max_stamina = 100
+        self.stamina_recharge_needed = False
+
+
+def test_stamina_bar_is_redrawn_only_when_the_fill_width_changes():
+    player = Player(50)
+    bar = StaminaBar(player)
+    screen = pygame.Surface((300, 100))
+    renders = []
+    render = bar.render
+    bar.render = lambda *args: (renders.append(args), render(*args))
+
+    bar.draw(screen, 10, 10, 220, 25)
+    layer_surface = bar.layer.surface
+    player.stamina = 50.25  # Still 110 pixels
+    bar.draw(screen, 10, 10, 220, 25)
+    assert len(renders) == 1
+
+    player.stamina = 51
+    bar.draw(screen, 10, 10, 220, 25)
+    assert len(renders) == 2
+    assert bar.layer.surface is layer_surface  # Same size, the layer surface is reused
+
+    player.stamina_recharge_needed = True
+    bar.draw(screen, 10, 10, 220, 25)
+    assert len(renders) == 3
+    assert screen.get_at((12 + 112, 20)) == pygame.Color(50, 50, 50)
@@ -0,0 +1,36 @@
+import pygame
+import map
+from conftest import LAVA_MAP, AIR_MAP
+from level_loader import LevelCache, LevelPreloader
+from map_package import load_map
+from tile_flags import get_tile_flags
+
+
+def test_opened_portal_preloads_its_target_map():
+    tmx_data = load_map(LAVA_MAP)
+    level_map = map.Map(tmx_data, 60)
+    prepared = []
+    preloader = LevelPreloader(lambda map_file, report_progress: prepared.append(map_file) or map_file, lambda level: None)
+    opened = []
+    level_map.interactives.subscribe("portal_opened", lambda target_maps=(): opened.append(target_maps))
+    level_map.interactives.subscribe("portal_opened", lambda target_maps=(): preloader.preload_first(target_maps, LevelCache(0)))
+
+    # All buttons are turned off after the control panel turned them on
+    level_map.turn_on_buttons()
+    for button in level_map.interactives.buttons:
+        level_map.turn_off_button(pygame.Rect(button.obj.x, button.obj.y, 1, 1))
+
+    assert opened == [[AIR_MAP]]
+    assert preloader.take(AIR_MAP) == AIR_MAP
+    assert prepared == [AIR_MAP]
+    teleport = level_map.interactives.teleports[0]
+    assert get_tile_flags(tmx_data).get_teleport_map(teleport.x, teleport.y) == AIR_MAP
+
+
+def test_warm_and_end_targets_are_not_preloaded():
+    prepared = []
+    preloader = LevelPreloader(lambda map_file, report_progress: prepared.append(map_file), lambda level: None)
+    assert preloader.preload_first([None, "end"]) is None
+    assert preloader.preload_first([AIR_MAP], {AIR_MAP}) == AIR_MAP
+    assert preloader.thread is None
+    assert prepared == []
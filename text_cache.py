@@ -0,0 +1,124 @@
+from collections import OrderedDict
+import pygame
+
+TEXT_CACHE_SIZE = 256  # Rendered texts kept before the least recently used one is dropped
+ATLAS_CHARACTERS = "0123456789+-:"  # Numbers are composed from pre-rendered glyphs
+
+fonts = {}
+
+
+def get_font(name, size, bold=False):
+    # Font objects are created only once, SysFont looks up system fonts every time
+    key = (name, size, bold)
+    if key not in fonts:
+        fonts[key] = pygame.font.SysFont(name, size, bold=bold)
+    return fonts[key]
+
+
+def get_outline_offsets(outline_width):
+    return ((-outline_width, 0), (outline_width, 0), (0, -outline_width), (0, outline_width))
+
+
+def outline_text(font, text, color, outline_color, outline_width):
+    # Text with an outline drawn around it, padded by outline_width on every side
+    text_surface = font.render(text, True, color)
+    outline_surface = font.render(text, True, outline_color)
+    image = pygame.Surface((text_surface.get_width() + outline_width * 2, text_surface.get_height() + outline_width * 2), pygame.SRCALPHA)
+    for dx, dy in get_outline_offsets(outline_width):
+        image.blit(outline_surface, (outline_width + dx, outline_width + dy))
+    image.blit(text_surface, (outline_width, outline_width))
+    return image
+
+
+class GlyphAtlas:
+    def __init__(self, font, color, outline_color, outline_width):
+        # One row of outlines and one row of filled glyphs for every atlas character
+        self.outline_width = outline_width
+        glyphs = {character: font.render(character, True, color) for character in ATLAS_CHARACTERS}
+        self.height = max(glyph.get_height() for glyph in glyphs.values())  # Rendered text can be taller than font.size
+        self.advances = {character: font.size(character)[0] for character in ATLAS_CHARACTERS}
+        # Kerning between two glyphs is the difference to their advances drawn separately
+        self.kerning = {(first, second): font.size(first + second)[0] - self.advances[first] - self.advances[second]
+                        for first in ATLAS_CHARACTERS for second in ATLAS_CHARACTERS}
+        padding = outline_width * 2
+        width = sum(glyph.get_width() for glyph in glyphs.values()) + padding * len(ATLAS_CHARACTERS)
+        self.surface = pygame.Surface((width, (self.height + padding) * 2), pygame.SRCALPHA)
+
+        self.outline_areas, self.glyph_areas = {}, {}
+        x = 0
+        for character, glyph in glyphs.items():
+            area_size = (glyph.get_width() + padding, glyph.get_height() + padding)
+            if outline_color is not None:
+                outline = font.render(character, True, outline_color)
+                for dx, dy in get_outline_offsets(outline_width):
+                    self.surface.blit(outline, (x + outline_width + dx, outline_width + dy))
+                self.outline_areas[character] = pygame.Rect((x, 0), area_size)
+            self.surface.blit(glyph, (x + outline_width, self.height + padding + outline_width))
+            self.glyph_areas[character] = pygame.Rect((x, self.height + padding), area_size)
+            x += area_size[0]
+
+    def get_positions(self, text):
+        # X position of every glyph and the width of the whole text
+        positions, x = [], 0
+        for index, character in enumerate(text):
+            if index:
+                x += self.kerning[text[index - 1], character]
+            positions.append(x)
+            x += self.advances[character]
+        return positions, x
+
+    def compose(self, text):
+        # Outlines of all glyphs go below the glyphs, like when the whole text is outlined at once
+        positions, width = self.get_positions(text)
+        padding = self.outline_width * 2
+        image = pygame.Surface((width + padding, self.height + padding), pygame.SRCALPHA)
+        for areas in (self.outline_areas, self.glyph_areas):
+            for x, character in zip(positions, text):
+                if character in areas:
+                    image.blit(self.surface, (x, 0), areas[character])
+        return image
+
+
+class TextRenderer:
+    def __init__(self, max_surfaces=TEXT_CACHE_SIZE):
+        self.max_surfaces = max_surfaces
+        self.surfaces = OrderedDict()  # (text, font, color, outline_color, outline_width) -> surface
+        self.atlases = {}
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, font, color, outline_color=None, outline_width=1):
+        # Cached text surface, font is a (name, size, bold) tuple
+        # Outlined texts are padded by outline_width, so they have to be blitted that much up and left
+        key = (text, font, color, outline_color, outline_width)
+        image = self.surfaces.get(key)
+        if image is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return image
+
+        self.misses += 1
+        if text and all(character in ATLAS_CHARACTERS for character in text):
+            image = self.get_atlas(font, color, outline_color, outline_width).compose(text)
+        elif outline_color is not None:
+            image = outline_text(get_font(*font), text, color, outline_color, outline_width)
+        else:
+            image = get_font(*font).render(text, True, color)
+
+        self.surfaces[key] = image
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return image
+
+    def get_atlas(self, font, color, outline_color, outline_width):
+        key = (font, color, outline_color, outline_width if outline_color is not None else 0)
+        if key not in self.atlases:
+            self.atlases[key] = GlyphAtlas(get_font(*font), color, outline_color, key[3])
+        return self.atlases[key]
+
+
+text_renderer = TextRenderer()
+
+
+def render_text(text, font, color, outline_color=None, outline_width=1):
+    return text_renderer.render(text, font, color, outline_color, outline_width)
@@ -0,0 +1,142 @@
+import json
+import os
+import pygame
+from pixel_cache import load_scaled_image
+from source_files import describe_source, is_source_fresh
+
+ATLAS_DIR = "Assets/Atlases"
+INDEX_FILE = "index.json"
+PAGE_SIZE = 1024  # Width and maximum height of one atlas image
+PADDING = 1  # Empty pixels between packed frames
+
+
+def get_entry_key(path, size=None):
+    # Index key of a frame directory loaded at a size, None means the size of the image files
+    path = os.path.normpath(path).replace(os.sep, "/")
+    return f"{path}|{size[0]}x{size[1]}" if size else f"{path}|native"
+
+
+def list_sources(path, kind):
+    # Image files the animation loaders read for a frame directory, sorted by path
+    if kind == "animations":
+        directories = [os.path.join(path, name) for name in os.listdir(path) if os.path.isdir(os.path.join(path, name))]
+        files = [os.path.join(directory, name) for directory in directories for name in os.listdir(directory)]
+    else:
+        files = [os.path.join(path, name) for name in os.listdir(path) if name.endswith('.png')]
+    return sorted(os.path.normpath(file).replace(os.sep, "/") for file in files if os.path.isfile(file))
+
+
+def pack_frames(sizes, page_size=PAGE_SIZE, padding=PADDING):
+    # Shelf packing, tallest frames first, returns (page, x, y) for every size in the given order
+    order = sorted(range(len(sizes)), key=lambda index: (-sizes[index][1], -sizes[index][0]))
+    positions = [None] * len(sizes)
+    page, x, y, shelf_height = 0, 0, 0, 0
+    for index in order:
+        width, height = sizes[index]
+        if width > page_size or height > page_size:
+            raise ValueError(f"Frame of size {width}x{height} does not fit into a {page_size}px atlas")
+        if x + width > page_size:
+            x, y, shelf_height = 0, y + shelf_height + padding, 0
+        if y + height > page_size:
+            page, x, y, shelf_height = page + 1, 0, 0, 0
+        positions[index] = (page, x, y)
+        x += width + padding
+        shelf_height = max(shelf_height, height)
+    return positions
+
+
+def build_atlas(entries, page_size=PAGE_SIZE, padding=PADDING):
+    # entries: key -> {"kind": ..., "sources": [path, ...], "frames": [(group, source, surface), ...]}
+    # Returns the atlas page surfaces and the index describing where every frame is
+    frames = [frame for entry in entries.values() for frame in entry["frames"]]
+    positions = pack_frames([surface.get_size() for _, _, surface in frames], page_size, padding)
+
+    page_heights = {}
+    for (_, _, surface), (page, x, y) in zip(frames, positions):
+        page_heights[page] = max(page_heights.get(page, 0), y + surface.get_height())
+    pages = [pygame.Surface((page_size, page_heights[page]), pygame.SRCALPHA) for page in sorted(page_heights)]
+
+    index = {"pages": [f"atlas_{page}.png" for page in range(len(pages))], "entries": {}}
+    position_iterator = iter(positions)
+    for key, entry in entries.items():
+        groups = {}
+        for group, source, surface in entry["frames"]:
+            page, x, y = next(position_iterator)
+            width, height = surface.get_size()
+            pages[page].blit(surface, (x, y))
+            groups.setdefault(group, []).append({
+                "page": page,
+                "rect": [x, y, width, height],
+                "size": [width, height],  # Size the frame was scaled to when baked
+                "pivot": [width // 2, height // 2],  # Frames are drawn and rotated around their centre
+                "source": source,
+            })
+        # Every file of the directory is recorded, so an edited, added or removed frame makes the entry stale
+        index["entries"][key] = {"kind": entry["kind"], "groups": groups, "sources": [describe_source(path) for path in entry["sources"]]}
+    return pages, index
+
+
+def save_atlas(pages, index, atlas_dir=ATLAS_DIR):
+    os.makedirs(atlas_dir, exist_ok=True)
+    for page, filename in zip(pages, index["pages"]):
+        pygame.image.save(page, os.path.join(atlas_dir, filename))
+    with open(os.path.join(atlas_dir, INDEX_FILE), "w") as file:
+        json.dump(index, file)
+
+
+class TextureAtlas:
+    def __init__(self, atlas_dir=ATLAS_DIR):
+        self.atlas_dir = atlas_dir
+        self.index = None
+        self.pages = {}  # Page number -> atlas image in display format
+        self.fresh = {}  # Entry key -> whether the image files still match the baked frames
+
+    def get_index(self):
+        # Index is read on first use, without a baked atlas every lookup misses
+        if self.index is None:
+            path = os.path.join(self.atlas_dir, INDEX_FILE)
+            self.index = {"pages": [], "entries": {}}
+            if os.path.exists(path):
+                with open(path) as file:
+                    self.index = json.load(file)
+        return self.index
+
+    def get_page(self, page):
+        if page not in self.pages:
+            path = os.path.join(self.atlas_dir, self.get_index()["pages"][page])
+            self.pages[page] = load_scaled_image(path)
+        return self.pages[page]
+
+    def get_frames(self, frames):
+        # Frames are subsurfaces sharing the pixels of their atlas page
+        return [self.get_page(frame["page"]).subsurface(frame["rect"]) for frame in frames]
+
+    def is_fresh(self, key, path, kind, entry):
+        # Checked once per entry, the image files are not expected to change while the game runs
+        if key not in self.fresh:
+            sources = entry.get("sources", [])
+            try:
+                unchanged = list_sources(path, kind) == [source["path"] for source in sources]
+            except OSError:
+                unchanged = False
+            self.fresh[key] = unchanged and all(is_source_fresh(source) for source in sources)
+        return self.fresh[key]
+
+    def get_groups(self, path, size, kind):
+        # Frame groups of a baked directory, None when it was not baked or its image files changed since
+        key = get_entry_key(path, size)
+        entry = self.get_index()["entries"].get(key)
+        if entry is None or entry["kind"] != kind or not self.is_fresh(key, path, kind, entry):
+            return None
+        return {group: self.get_frames(frames) for group, frames in entry["groups"].items()}
+
+    def get_animations(self, base_path, size):
+        # Animation type -> frames, None when the directory was not baked at this size
+        return self.get_groups(base_path, size, "animations")
+
+    def get_animation_frames(self, animation_path, size=None):
+        groups = self.get_groups(animation_path, size, "frames")
+        return None if groups is None else groups.get("", [])
+
+
+atlas = TextureAtlas()
@@ -0,0 +1,70 @@
+import bisect
+import pytmx
+
+
+class AnimatedTileIndex:
+    def __init__(self, tmx_data):
+        self.tmx_data = tmx_data
+        self.frames = {}  # gid -> frame gids, also for zero length state switches
+        self.timelines = {}  # gid -> (cumulative frame end times, frame gids, period)
+        self.frame_time = None
+        self.frame_gids = {}  # Current frame of each gid, shared by all tiles for one elapsed time
+
+        for layer in tmx_data.layers:
+            if isinstance(layer, pytmx.TiledTileLayer):
+                for row in layer.data:
+                    for gid in set(row):
+                        self.add_gid(gid)
+            elif isinstance(layer, pytmx.TiledObjectGroup):
+                for obj in layer:
+                    if getattr(obj, "gid", 0):
+                        self.add_gid(obj.gid)
+
+    def add_gid(self, gid):
+        # Index animation frames of the gid and of every gid it can switch to
+        if gid == 0 or gid in self.frames:
+            return
+        tile_properties = self.tmx_data.get_tile_properties_by_gid(gid)
+        if not tile_properties or "frames" not in tile_properties:
+            self.frames[gid] = None
+            return
+
+        animation_frames = tile_properties["frames"]
+        self.frames[gid] = [frame_gid for frame_gid, duration in animation_frames]
+        frame_ends, duration_sum = [], 0
+        for frame_gid, duration in animation_frames:
+            duration_sum += duration
+            frame_ends.append(duration_sum)
+        if duration_sum > 0:
+            self.timelines[gid] = (frame_ends, self.frames[gid], duration_sum)
+
+        for frame_gid in self.frames[gid]:
+            self.add_gid(frame_gid)
+
+    def is_animated(self, gid):
+        if gid not in self.frames:
+            self.add_gid(gid)
+        return gid in self.timelines
+
+    def get_frames(self, gid):
+        # Frame gids of the tile or None if the tile has no animation
+        if gid not in self.frames:
+            self.add_gid(gid)
+        return self.frames.get(gid)
+
+    def get_frame_gid(self, gid, elapsed_time):
+        # Return the GID of the current animation frame based on elapsed time
+        timeline = self.timelines.get(gid)
+        if timeline is None:
+            return gid
+
+        if elapsed_time != self.frame_time:
+            self.frame_time = elapsed_time
+            self.frame_gids.clear()
+
+        frame_gid = self.frame_gids.get(gid)
+        if frame_gid is None:
+            frame_ends, frame_gids, period = timeline
+            frame_gid = frame_gids[bisect.bisect_right(frame_ends, elapsed_time % period)]
+            self.frame_gids[gid] = frame_gid
+        return frame_gid
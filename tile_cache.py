@@ -0,0 +1,122 @@
+import pygame
+import pytmx
+
+CHUNK_SIZE = 16  # Number of tiles on one side of a chunk
+
+
+class TileChunkCache:
+    def __init__(self, tmx_data, animation_index, chunk_size=CHUNK_SIZE):
+        self.tmx_data = tmx_data
+        self.animation_index = animation_index
+        self.chunk_size = chunk_size
+        self.tile_width, self.tile_height = tmx_data.tilewidth, tmx_data.tileheight
+        self.chunk_width = chunk_size * self.tile_width
+        self.chunk_height = chunk_size * self.tile_height
+        self.chunks_x = -(-tmx_data.width // chunk_size)
+        self.chunks_y = -(-tmx_data.height // chunk_size)
+        self.layers = [layer for layer in tmx_data.layers if isinstance(layer, pytmx.TiledTileLayer)]
+
+        # Baked static tiles and animated cells drawn on top of them, per (layer_index, chunk_x, chunk_y)
+        self.surfaces = {}
+        self.animated_cells = {}
+        self.shown_frames = {}  # Frame of each animated gid drawn by the last render
+        self.dirty = {(layer_index, cx, cy)
+                      for layer_index in range(len(self.layers))
+                      for cx in range(self.chunks_x)
+                      for cy in range(self.chunks_y)}
+
+    def invalidate_tile(self, layer, x, y):
+        # Mark the chunk containing the tile for rebaking
+        if layer in self.layers:
+            self.dirty.add((self.layers.index(layer), x // self.chunk_size, y // self.chunk_size))
+
+    def invalidate_all(self):
+        self.dirty.update(self.surfaces.keys())
+
+    def bake_chunk(self, key):
+        # Pre-render static tiles of one chunk into a single surface
+        layer_index, cx, cy = key
+        layer = self.layers[layer_index]
+        start_x, start_y = cx * self.chunk_size, cy * self.chunk_size
+        end_x = min(self.tmx_data.width, start_x + self.chunk_size)
+        end_y = min(self.tmx_data.height, start_y + self.chunk_size)
+
+        static_tiles, animated = [], []
+        overflow_x = overflow_y = 0
+        for y in range(start_y, end_y):
+            row = layer.data[y]
+            for x in range(start_x, end_x):
+                gid = row[x]
+                if gid == 0:
+                    continue
+                if self.animation_index.is_animated(gid):
+                    animated.append((x, y, gid))
+                    continue
+                tile_image = self.tmx_data.get_tile_image_by_gid(gid)
+                if tile_image:
+                    static_tiles.append((tile_image, (x - start_x) * self.tile_width, (y - start_y) * self.tile_height))
+                    overflow_x = max(overflow_x, tile_image.get_width() - self.tile_width)
+                    overflow_y = max(overflow_y, tile_image.get_height() - self.tile_height)
+
+        surface = None
+        if static_tiles:
+            # Tiles bigger than the grid may overflow to the right and bottom
+            size = (self.chunk_width + overflow_x, self.chunk_height + overflow_y)
+            surface = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+            for tile_image, x_pos, y_pos in static_tiles:
+                surface.blit(tile_image, (x_pos, y_pos))
+
+        self.surfaces[key] = surface
+        self.animated_cells[key] = animated
+        self.dirty.discard(key)
+
+    def release(self):
+        # Drop baked chunks, they are baked again when they are rendered
+        self.invalidate_all()
+        self.surfaces.clear()
+        self.animated_cells.clear()
+        self.shown_frames.clear()
+
+    def bake_area(self, area):
+        # Bake chunks overlapping the area before they are rendered, e.g. while the level is preloaded
+        start_cx, end_cx = max(0, area.left // self.chunk_width), min(self.chunks_x, area.right // self.chunk_width + 1)
+        start_cy, end_cy = max(0, area.top // self.chunk_height), min(self.chunks_y, area.bottom // self.chunk_height + 1)
+        for layer_index in range(len(self.layers)):
+            for cy in range(start_cy, end_cy):
+                for cx in range(start_cx, end_cx):
+                    if (layer_index, cx, cy) in self.dirty:
+                        self.bake_chunk((layer_index, cx, cy))
+
+    def render(self, screen, camera, elapsed_time):
+        # Blit chunks overlapping the camera, then animated tiles of each visible chunk
+        # Returns screen rects which changed since the last render
+        start_cx, end_cx = max(0, camera.left // self.chunk_width), min(self.chunks_x, camera.right // self.chunk_width + 1)
+        start_cy, end_cy = max(0, camera.top // self.chunk_height), min(self.chunks_y, camera.bottom // self.chunk_height + 1)
+        start_x, end_x = camera.left // self.tile_width, camera.right // self.tile_width + 1
+        start_y, end_y = camera.top // self.tile_height, camera.bottom // self.tile_height + 1
+
+        changed_rects = []
+        shown_frames, self.shown_frames = self.shown_frames, {}
+        for layer_index in range(len(self.layers)):
+            for cy in range(start_cy, end_cy):
+                for cx in range(start_cx, end_cx):
+                    key = (layer_index, cx, cy)
+                    chunk_pos = (cx * self.chunk_width - camera.x, cy * self.chunk_height - camera.y)
+                    if key in self.dirty:
+                        self.bake_chunk(key)
+                        changed_rects.append(pygame.Rect(chunk_pos, (self.chunk_width, self.chunk_height)))
+
+                    surface = self.surfaces[key]
+                    if surface:
+                        screen.blit(surface, chunk_pos)
+
+                    for x, y, gid in self.animated_cells[key]:
+                        if start_x <= x < end_x and start_y <= y < end_y:
+                            frame_gid = self.animation_index.get_frame_gid(gid, elapsed_time)
+                            self.shown_frames[gid] = frame_gid
+                            tile_image = self.tmx_data.get_tile_image_by_gid(frame_gid)
+                            if tile_image:
+                                tile_rect = screen.blit(tile_image, (x * self.tile_width - camera.x, y * self.tile_height - camera.y))
+                                if shown_frames.get(gid) != frame_gid:
+                                    changed_rects.append(tile_rect)
+        return changed_rects
@@ -0,0 +1,123 @@
+import weakref
+import numpy as np
+import pytmx
+
+# Bit flags stored for every tile of the map
+WALKABLE = 1
+TELEPORT = 2
+SPAWN = 4
+
+WALK_LAYER = "Ground"
+STRUCTURE_LAYER = "BackgroundStructures"
+
+_grids = weakref.WeakKeyDictionary()
+
+
+def get_tile_flags(tmx_data):
+    # Flags grid of the map, built on first use
+    grid = _grids.get(tmx_data)
+    if grid is None:
+        grid = TileFlagsGrid(tmx_data)
+        _grids[tmx_data] = grid
+    return grid
+
+
+def set_tile_flags(tmx_data, grid):
+    # Use a grid restored from a compiled map instead of scanning the layers again
+    _grids[tmx_data] = grid
+
+
+class TileFlagsGrid:
+    def __init__(self, tmx_data, flags=None, map_ids=None, map_names=None, spawn_position=None):
+        # Grids are built from tile layers unless already computed ones are given
+        self.tmx_data = tmx_data
+        self.width, self.height = tmx_data.width, tmx_data.height
+        if flags is not None:
+            self.flags, self.map_ids = flags, map_ids
+            self.map_names = list(map_names)
+            self.spawn_position = spawn_position
+            return
+        self.flags = np.zeros((self.height, self.width), dtype=np.uint8)
+        self.map_ids = np.full((self.height, self.width), -1, dtype=np.int16)  # Index to map_names for teleports
+        self.map_names = []
+        self.spawn_position = None
+        self.refresh()
+
+    def get_map_id(self, map_name):
+        if map_name not in self.map_names:
+            self.map_names.append(map_name)
+        return self.map_names.index(map_name)
+
+    def get_gid_flags(self, gid, layer):
+        # Flags and teleport target of one gid placed in the given layer
+        tile_properties = self.tmx_data.get_tile_properties_by_gid(gid) if gid else None
+        if not tile_properties:
+            return 0, -1
+        flags, map_id = 0, -1
+        if layer.name == WALK_LAYER and tile_properties.get("canWalk") == 1:
+            flags |= WALKABLE
+        if layer.name == STRUCTURE_LAYER and tile_properties.get("teleport") == 1:
+            flags |= TELEPORT
+            map_id = self.get_map_id(tile_properties.get("map"))
+        if layer.visible and tile_properties.get("spawn"):
+            flags |= SPAWN
+        return flags, map_id
+
+    def refresh(self):
+        # Rebuild the whole grid from tile layers
+        self.flags.fill(0)
+        self.map_ids.fill(-1)
+        self.spawn_position = None
+        for layer in self.tmx_data.layers:
+            if isinstance(layer, pytmx.TiledTileLayer):
+                gids = np.array(layer.data, dtype=np.int64)
+                unique_gids, gid_indexes = np.unique(gids, return_inverse=True)
+                gid_flags = [self.get_gid_flags(int(gid), layer) for gid in unique_gids]
+                layer_flags = np.array([flags for flags, map_id in gid_flags], dtype=np.uint8)[gid_indexes].reshape(gids.shape)
+                layer_map_ids = np.array([map_id for flags, map_id in gid_flags], dtype=np.int16)[gid_indexes].reshape(gids.shape)
+                self.flags |= layer_flags
+                self.map_ids = np.where(layer_map_ids >= 0, layer_map_ids, self.map_ids)
+
+                # Spawn is the first spawn tile in layer order
+                if self.spawn_position is None:
+                    spawn_tiles = np.argwhere(layer_flags & SPAWN)
+                    if len(spawn_tiles):
+                        tile_y, tile_x = spawn_tiles[0]
+                        self.spawn_position = (int(tile_x) * self.tmx_data.tilewidth, int(tile_y) * self.tmx_data.tileheight)
+
+    def refresh_tile(self, tile_x, tile_y):
+        # Update flags of one tile after its gid was changed
+        flags, map_id = 0, -1
+        for layer in self.tmx_data.layers:
+            if isinstance(layer, pytmx.TiledTileLayer):
+                layer_flags, layer_map_id = self.get_gid_flags(layer.data[tile_y][tile_x], layer)
+                flags |= layer_flags
+                if layer_map_id >= 0:
+                    map_id = layer_map_id
+        self.flags[tile_y, tile_x] = flags
+        self.map_ids[tile_y, tile_x] = map_id
+
+    def in_bounds(self, tile_x, tile_y):
+        return 0 <= tile_x < self.width and 0 <= tile_y < self.height
+
+    def has_flag(self, tile_x, tile_y, flag):
+        return self.in_bounds(tile_x, tile_y) and bool(self.flags[tile_y, tile_x] & flag)
+
+    def is_walkable(self, tile_x, tile_y):
+        return self.has_flag(tile_x, tile_y, WALKABLE)
+
+    def get_teleport_map(self, tile_x, tile_y):
+        # Name of the map the teleport leads to, None if the tile is not an active teleport
+        if self.has_flag(tile_x, tile_y, TELEPORT):
+            return self.map_names[self.map_ids[tile_y, tile_x]]
+        return None
+
+    def has_flag_many(self, tiles_x, tiles_y, flag):
+        # Vectorized lookup for arrays of tile coordinates, tiles outside of the map have no flags
+        tiles_x, tiles_y = np.asarray(tiles_x, dtype=np.int64), np.asarray(tiles_y, dtype=np.int64)
+        inside = (tiles_x >= 0) & (tiles_x < self.width) & (tiles_y >= 0) & (tiles_y < self.height)
+        flags = self.flags[np.clip(tiles_y, 0, self.height - 1), np.clip(tiles_x, 0, self.width - 1)]
+        return inside & ((flags & flag) != 0)
+
+    def is_walkable_many(self, tiles_x, tiles_y):
+        return self.has_flag_many(tiles_x, tiles_y, WALKABLE)
@@ -1,5 +1,5 @@
 # utils.py
-import pytmx
+from tile_flags import get_tile_flags
 
 def get_tile_under_player(player_rect, tmx_data):
     # Get the tile position under the player
@@ -12,38 +12,18 @@ def get_tile_under_player(player_rect, tmx_data):
 
     return tile_x, tile_y
 
-def get_walk_tile_properties(tile_x, tile_y, tmx_data):
-    # Get the properties of the tile under the player
-    tile_layer = tmx_data.get_layer_by_name("Ground")
-    if 0 <= tile_x < tile_layer.width and 0 <= tile_y < tile_layer.height:
-        gid = tile_layer.data[tile_y][tile_x]
-        if gid != 0:
-            tile_properties = tmx_data.get_tile_properties_by_gid(gid)
-            return tile_properties
-    return None
-
-
-def get_structure_tile_properties(tile_x, tile_y, tmx_data):
-    # Get the properties of the tile under the player
-    tile_layer = tmx_data.get_layer_by_name("BackgroundStructures")
-    gid = tile_layer.data[tile_y][tile_x]
-    if gid != 0:
-        tile_properties = tmx_data.get_tile_properties_by_gid(gid)
-        return tile_properties
-    return None
+def is_tile_walkable(tile_x, tile_y, tmx_data):
+    # Check the canWalk flag of the Ground tile
+    return get_tile_flags(tmx_data).is_walkable(tile_x, tile_y)
+
+
+def get_teleport_map(tile_x, tile_y, tmx_data):
+    # Get the map of an active teleport in BackgroundStructures, None if there is no teleport
+    return get_tile_flags(tmx_data).get_teleport_map(tile_x, tile_y)
 
 def get_spawn_position(tmx_data):
     # Find position of tile with property spawn
-    for layer in tmx_data.visible_layers:
-        if isinstance(layer, pytmx.TiledTileLayer):
-            for x, y, gid in layer:
-                if gid != 0:  # Ak dlaždica existuje
-                    tile_properties = tmx_data.get_tile_properties_by_gid(gid)
-                    if tile_properties and tile_properties.get("spawn"):
-                        tile_width = tmx_data.tilewidth
-                        tile_height = tmx_data.tileheight
-                        return x * tile_width, y * tile_height
-    return None
+    return get_tile_flags(tmx_data).spawn_position
 
 
 